@@ -7,6 +7,13 @@ main_script = 'main.py'
 # 添加字体文件
 fonts_datas = [(os.path.join('fonts', 'SourceHanSansSC-Regular-2.otf'), 'fonts')]
 
+# 界面字体子集（见 mdword.fonts）：启动时代替完整字体；完整字体仍要打包，用于显示子集之外的字符
+try:
+    from mdword.fonts import build_subset
+    fonts_datas.append((build_subset(fonts_datas[0][0], os.path.join('build', 'fonts')), 'fonts'))
+except ImportError:
+    print('未安装 fontTools，不打包界面字体子集，首次运行时再生成')
+
 hidden_imports = collect_submodules('keyboard') + collect_submodules('pystray')
 
 a = Analysis(
@@ -17,7 +24,8 @@ a = Analysis(
     hiddenimports=hidden_imports,
     hookspath=[],
     runtime_hooks=[],
-    excludes=[],
+    # 子集已在打包时生成，运行时不需要 fontTools
+    excludes=['fontTools'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=None,
@@ -0,0 +1,37 @@
+"""mdword 核心：与界面无关的Markdown清洗与Word导出逻辑
+
+只依赖标准库即可导入；python-docx 在第一次调用 to_docx 时才加载。
+"""
+from .options import Options, options_from, describe_options
+from .cleaner import clean
+from .blocks import IncrementalCleaner
+from .stream import iter_clean, clean_file
+from .tree import DocumentParser, parse as parse_document
+
+
+def to_docx(text, options, out, tree=None, progress=None):
+    """按选项把Markdown文本导出为Word文档（out 为文件路径、文件描述符或二进制文件对象；
+    tree 为 parse_document 或 DocumentParser 已解析好的文档树，可省略；
+    progress(已写出的块数, 总块数) 报告进度，在其中抛出异常可取消导出）"""
+    from .export import to_docx
+    return to_docx(text, options, out, tree, progress)
+
+
+def to_docx_bytes(text, options, tree=None):
+    """按选项把Markdown文本导出为 .docx 文件内容（bytes）"""
+    from .export import to_docx_bytes
+    return to_docx_bytes(text, options, tree)
+
+
+def warm_up():
+    """预先导入 python-docx 并建好导出模板，之后第一次导出不再有这部分开销；
+    可在后台线程或工作进程启动时调用。没有安装 python-docx 时只预热清洗"""
+    clean('', Options())
+    try:
+        to_docx_bytes('', Options())
+    except ImportError:
+        pass  # 没有 python-docx，导出时再报告
+
+
+__all__ = ['Options', 'options_from', 'describe_options', 'clean', 'iter_clean', 'clean_file', 'to_docx',
+           'to_docx_bytes', 'warm_up', 'IncrementalCleaner', 'DocumentParser', 'parse_document']
@@ -0,0 +1,182 @@
+"""对抗性输入回归检查：python -m mdword.adversarial [--size 字符数] [--limit 秒] [--max-growth 倍数]
+
+大量未闭合或互相嵌套的标记曾让惰性正则退化为平方级甚至立方级，一次粘贴就能
+让程序卡死几分钟。这里对每个对抗性输入分别运行清洗和Word导出的行内格式处理
+（整段文本作为一个段落），每个输入在子进程中运行并有时间上限，超时或出错即
+判为失败（返回码为 1）。
+
+时间上限只能发现严重的退化；每个输入还会放大 SCALE_FACTOR 倍再运行一次，耗时
+增长超过 max-growth 倍（线性约为 4 倍，平方级约为 16 倍）同样判为失败。
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+
+from .options import Options
+
+DEFAULT_SIZE = 100000
+
+# 单个输入、单项操作的时间上限（秒）：线性实现远低于此，退化为平方级时要几分钟以上
+DEFAULT_LIMIT = 20.0
+
+# 规模检查：输入放大的倍数，以及放大后耗时允许增长的倍数
+SCALE_FACTOR = 4
+DEFAULT_MAX_GROWTH = 6.0
+
+# 放大后耗时低于此值（秒）时不看增长倍数，毫秒级的计时误差会让倍数失真
+MIN_SCALED_TIME = 0.05
+
+# 全部清洗选项开启，覆盖所有规则；表格转换另有一组
+OPTION_SETS = {
+    'all': Options(True, True, True, True, True, True, False, "无", True),
+    'table': Options(True, True, True, True, True, True, True, ",", True),
+}
+
+
+def _repeat(unit, size):
+    return unit * (size // len(unit) + 1)
+
+
+# 每个输入按给定字符数生成（约数）
+INPUTS = {
+    'unclosed_links': lambda size: _repeat('[a](b ', size),
+    'open_brackets': lambda size: '[' * size,
+    'bracket_paren': lambda size: _repeat('[a](', size),
+    'unclosed_md': lambda size: 'md``' + 'x' * size,
+    'many_md': lambda size: _repeat('md`` ', size),
+    'md_then_bold': lambda size: _repeat('md``**', size),
+    'bold_then_md': lambda size: _repeat('**md``', size),
+    'bold_runs': lambda size: _repeat('* ** ', size),
+    'unclosed_bold': lambda size: '** ' + 'a' * size,
+    'underscores': lambda size: _repeat('_ __ ', size),
+    'equals': lambda size: _repeat('= == ', size),
+    'tildes': lambda size: _repeat('~ ~~ ', size),
+    'quotes': lambda size: _repeat("' '' \" ", size),
+    'backticks': lambda size: _repeat('` `` ', size),
+    'all_unclosed': lambda size: _repeat('**a md`` *b _c ==d ~~e [f](g `h ', size),
+    'blank_lines': lambda size: '-\n' + '\n' * size + '--x',
+    'space_lines': lambda size: _repeat(' \n', size) + '* x',
+    'pipes': lambda size: _repeat('| a ', size),
+    'separator_lines': lambda size: _repeat('|---|\n', size),
+}
+
+
+def _clean(text, options):
+    from .cleaner import clean
+    clean(text, options)
+
+
+def _incremental(text, options):
+    from .blocks import IncrementalCleaner
+    IncrementalCleaner().clean(text, options)
+
+
+def _inline(text, options):
+    from .ooxml import _runs
+    from .tree import inline_runs
+    _runs(inline_runs(text, options))
+
+
+OPERATIONS = {
+    'clean': _clean,
+    'incremental': _incremental,
+    'inline': _inline,
+}
+
+
+def _run(conn, operation, name, size, option_name):
+    """子进程：生成输入并计时，把耗时（或错误信息）发回父进程"""
+    text = INPUTS[name](size)
+    start = time.perf_counter()
+    try:
+        OPERATIONS[operation](text, OPTION_SETS[option_name])
+    except Exception as e:
+        conn.send(f"出错: {str(e)}")
+    else:
+        conn.send(time.perf_counter() - start)
+    conn.close()
+
+
+def check(operation, name, size, option_name, limit):
+    """运行一个用例，返回耗时（秒）；超时返回 None，出错返回错误信息"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run, args=(sender, operation, name, size, option_name))
+    process.start()
+    sender.close()
+    try:
+        # 生成输入和启动子进程的时间不计入上限，另留一些余量
+        if receiver.poll(limit + 5):
+            return receiver.recv()
+        return None
+    except EOFError:
+        return "子进程异常退出"
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m mdword.adversarial',
+                                     description='对抗性输入回归检查：每个输入都必须在时间上限内完成')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help=f'每个输入的字符数（默认 {DEFAULT_SIZE}）')
+    parser.add_argument('--limit', type=float, default=DEFAULT_LIMIT, help=f'每项的时间上限，秒（默认 {DEFAULT_LIMIT}）')
+    parser.add_argument('--max-growth', type=float, default=DEFAULT_MAX_GROWTH,
+                        help=f'输入放大 {SCALE_FACTOR} 倍后耗时允许增长的倍数（默认 {DEFAULT_MAX_GROWTH}）')
+    parser.add_argument('--inputs', nargs='+', choices=tuple(INPUTS), default=tuple(INPUTS), help='要检查的输入')
+    parser.add_argument('--operations', nargs='+', choices=tuple(OPERATIONS), default=tuple(OPERATIONS),
+                        help='要检查的操作')
+    return parser
+
+
+def _status(result, limit):
+    """单次运行的结果说明；在时间上限内完成时返回 (说明, 耗时)，否则耗时为 None"""
+    if isinstance(result, float) and result <= limit:
+        return f"{result * 1000:.1f} ms", result
+    if result is None:
+        return f"超时（>{limit:g} s）", None
+    if isinstance(result, float):
+        return f"超时（{result:.1f} s）", None
+    return result, None
+
+
+def _retry(operation, name, size, option_name, limit, previous):
+    """再运行一次，返回两次中较快的耗时；再次运行失败时沿用之前的耗时"""
+    result = check(operation, name, size, option_name, limit)
+    return min(previous, result) if isinstance(result, float) else previous
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    failed = 0
+    for name in args.inputs:
+        for operation in args.operations:
+            for option_name in OPTION_SETS:
+                status, small = _status(check(operation, name, args.size, option_name, args.limit), args.limit)
+                ok = small is not None
+                if ok:
+                    scaled_size = args.size * SCALE_FACTOR
+                    scaled, big = _status(check(operation, name, scaled_size, option_name, args.limit), args.limit)
+                    ok = big is not None
+                    if ok and big >= MIN_SCALED_TIME and big > small * args.max_growth:
+                        # 单次计时可能受到其他进程干扰，两种大小各重测一次，取较快的一次
+                        small = _retry(operation, name, args.size, option_name, args.limit, small)
+                        big = _retry(operation, name, scaled_size, option_name, args.limit, big)
+                        status, scaled = _status(small, args.limit)[0], _status(big, args.limit)[0]
+                    status = f"{status:>10} → {scaled}"
+                    if ok and big >= MIN_SCALED_TIME:
+                        growth = big / max(small, 1e-6)
+                        status += f"（×{growth:.1f}）"
+                        if growth > args.max_growth:
+                            ok = False
+                            status += f" 增长超过 {args.max_growth:g} 倍"
+                if not ok:
+                    failed += 1
+                print(f"{name:<18}{operation:<13}{option_name:<7}{status}", flush=True)
+    print(f"完成: {len(args.inputs) * len(args.operations) * len(OPTION_SETS)} 项，失败 {failed} 项")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""性能基准：python -m mdword.bench [-o 结果.json] [--compare 上次结果.json]
+
+用固定随机种子生成几类专门压测某条处理路径的合成文档，分别计时清洗
+（每种选项组合）和Word导出，记录吞吐量（MB/s）、峰值内存和 .docx 大小，
+结果写入JSON文件，便于在两次运行之间比较。
+
+每个用例在新的子进程中运行，峰值内存互不影响。
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .options import Options
+
+# 默认的文档大小（MB）
+DEFAULT_SIZES = (0.1, 1.0)
+
+# 每个用例重复的次数，取最快的一次
+DEFAULT_REPEAT = 3
+
+DEFAULT_OUTPUT = 'mdword-bench.json'
+
+# 参与计时的选项组合：无选项、各单项、全部开启
+OPTION_SETS = {
+    'none': Options(),
+    'italic': Options(remove_italic=True),
+    'strikethrough': Options(remove_strikethrough=True),
+    'highlight': Options(remove_highlight=True),
+    'links': Options(remove_links=True),
+    'lists': Options(remove_unordered_list=True, remove_ordered_list=True),
+    'table_clean': Options(table_clean=True),
+    'table_tab': Options(table_conversion="/t"),
+    'all': Options(True, True, True, True, True, True, True, ",", True),
+}
+
+# 导出Word时使用的选项组合（导出只受部分选项影响）
+EXPORT_OPTION_SETS = ('none', 'all')
+
+WORDS = ('markdown', 'word', '文档', '清洗', 'table', '导出', 'quote', 'text', '格式', 'code')
+
+
+def _words(rnd, count):
+    return ' '.join(rnd.choice(WORDS) for _ in range(count))
+
+
+def _headings(rnd):
+    """标题密集：各级标题、强调、分割线与短段落交替"""
+    lines = []
+    for level in range(1, 7):
+        lines.append(f"{'#' * level} {_words(rnd, 3)} **{_words(rnd, 1)}**")
+        lines.append(f"{_words(rnd, 8)} *{_words(rnd, 2)}* ~~{_words(rnd, 1)}~~ =={_words(rnd, 1)}==")
+    lines += ['---', '']
+    return '\n'.join(lines)
+
+
+def _tables(rnd):
+    """大型管道表格：表头、分隔行和大量数据行，单元格含行内格式"""
+    columns = rnd.randint(4, 8)
+    lines = ['| ' + ' | '.join(_words(rnd, 1) for _ in range(columns)) + ' |',
+             '|' + '|'.join(':---:' for _ in range(columns)) + '|']
+    for _ in range(rnd.randint(40, 80)):
+        cells = [rnd.choice((_words(rnd, 2), f"**{_words(rnd, 1)}**", f"`{_words(rnd, 1)}`",
+                             f"[{_words(rnd, 1)}](https://example.com/{rnd.randint(0, 999)})"))
+                 for _ in range(columns)]
+        lines.append('| ' + ' | '.join(cells) + ' |')
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def _quotes(rnd):
+    """多层嵌套引用，引用中含代码块"""
+    lines = []
+    for depth in range(1, rnd.randint(3, 7)):
+        prefix = '> ' * depth
+        lines.append(f"{prefix}{_words(rnd, 10)} **{_words(rnd, 1)}**")
+        lines.append(f"{prefix}```python")
+        lines += [f"{prefix}def f{i}(x):  # {_words(rnd, 2)}" for i in range(rnd.randint(2, 5))]
+        lines.append(f"{prefix}```")
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def _md_spans(rnd):
+    """大量 md`` 片段，部分跨行"""
+    parts = []
+    for _ in range(rnd.randint(10, 20)):
+        if rnd.random() < 0.3:
+            parts.append(f"md``{_words(rnd, 3)}\n{_words(rnd, 3)}``")
+        else:
+            parts.append(f"md``{_words(rnd, 2)}``")
+        parts.append(_words(rnd, 4))
+    return ' '.join(parts) + '\n'
+
+
+def _inline_code(rnd):
+    """很长的段落，夹杂大量行内代码与链接"""
+    parts = []
+    for _ in range(rnd.randint(80, 160)):
+        parts.append(rnd.choice((f"`{_words(rnd, 2)}`", _words(rnd, 3),
+                                 f"[{_words(rnd, 1)}](https://example.com)", f"**{_words(rnd, 2)}**")))
+    return ' '.join(parts) + '\n\n'
+
+
+def _mixed(rnd):
+    return rnd.choice(tuple(SECTION_BUILDERS[name] for name in SHAPES if name != 'mixed'))(rnd)
+
+
+SECTION_BUILDERS = {
+    'headings': _headings,
+    'tables': _tables,
+    'quotes': _quotes,
+    'md_spans': _md_spans,
+    'inline_code': _inline_code,
+    'mixed': _mixed,
+}
+
+SHAPES = tuple(SECTION_BUILDERS)
+
+
+def make_corpus(shape, size, seed=0):
+    """生成约 size 字节（UTF-8）的指定类型文档，同样的参数总是得到同样的文本"""
+    rnd = random.Random(f"{shape}:{seed}")
+    build = SECTION_BUILDERS[shape]
+    sections = []
+    total = 0
+    while total < size:
+        section = build(rnd)
+        sections.append(section)
+        total += len(section.encode('utf-8')) + 1
+    return '\n'.join(sections)
+
+
+def peak_rss():
+    """当前进程的峰值常驻内存（字节），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KB 为单位
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def _run_clean(text, options):
+    from .cleaner import clean
+    return clean(text, options), None
+
+
+def _run_incremental(text, options):
+    # 与界面中 process_markdown 相同的路径：首次清洗，没有可复用的块
+    from .blocks import IncrementalCleaner
+    return IncrementalCleaner().clean(text, options), None
+
+
+def _run_stream(text, options):
+    from .stream import iter_clean
+    return ''.join(iter_clean(io.StringIO(text), options)), None
+
+
+def _run_docx(text, options):
+    # 与界面中 save_word_document_simple 相同：生成文档并写入磁盘
+    from .export import to_docx
+    fd, path = tempfile.mkstemp(suffix='.docx')
+    os.close(fd)
+    try:
+        to_docx(text, options, path)
+        return None, os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+OPERATIONS = {
+    'clean': _run_clean,
+    'incremental': _run_incremental,
+    'stream': _run_stream,
+    'docx': _run_docx,
+}
+
+
+def run_case(operation, shape, size, option_name, repeat, seed=0):
+    """在当前进程中运行一个用例，返回结果记录"""
+    text = make_corpus(shape, size, seed)
+    options = OPTION_SETS[option_name]
+    run = OPERATIONS[operation]
+    input_bytes = len(text.encode('utf-8'))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output, docx_bytes = run(text, options)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'operation': operation,
+        'shape': shape,
+        'options': option_name,
+        'input_bytes': input_bytes,
+        'seconds': best,
+        'mb_per_s': input_bytes / 1e6 / best if best else None,
+        'peak_rss_bytes': peak_rss(),
+        'output_bytes': len(output.encode('utf-8')) if output is not None else None,
+        'docx_bytes': docx_bytes,
+    }
+
+
+def cases(operations, shapes, sizes, option_names):
+    for size in sizes:
+        for shape in shapes:
+            for operation in operations:
+                names = [name for name in option_names if operation != 'docx' or name in EXPORT_OPTION_SETS]
+                for option_name in names:
+                    yield operation, shape, int(size * 1e6), option_name
+
+
+def case_key(result):
+    return result['operation'], result['shape'], result['options'], result['input_bytes']
+
+
+def compare(results, baseline_path):
+    """打印与上一次结果相比的耗时变化"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {case_key(result): result for result in json.load(f)['results']}
+    print(f"\n与 {baseline_path} 比较（耗时比 = 本次/上次，小于 1 表示变快）:")
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old and old['seconds']:
+            print(f"  {result['operation']:<12}{result['shape']:<12}{result['options']:<14}"
+                  f"{result['input_bytes'] / 1e6:>7.2f} MB  {result['seconds'] / old['seconds']:.2f}x")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m mdword.bench', description='mdword 清洗与Word导出的性能基准')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help=f'结果文件（默认 {DEFAULT_OUTPUT}）')
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES, help='文档大小（MB）')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=SHAPES, help='文档类型')
+    parser.add_argument('--operations', nargs='+', choices=tuple(OPERATIONS), default=tuple(OPERATIONS),
+                        help='计时的操作')
+    parser.add_argument('--options', nargs='+', choices=tuple(OPTION_SETS), default=tuple(OPTION_SETS),
+                        help='选项组合（导出Word只使用其中的 ' + '、'.join(EXPORT_OPTION_SETS) + '）')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个用例的重复次数，取最快的一次')
+    parser.add_argument('--compare', help='与之前保存的结果文件比较')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = []
+    for operation, shape, size, option_name in cases(args.operations, args.shapes, args.sizes, args.options):
+        # 每个用例使用新进程，峰值内存不受之前用例的影响
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_case, operation, shape, size, option_name, args.repeat).result()
+        results.append(result)
+        print(f"{operation:<12}{shape:<12}{option_name:<14}{result['input_bytes'] / 1e6:>7.2f} MB"
+              f"{result['seconds'] * 1000:>10.1f} ms{result['mb_per_s']:>9.3f} MB/s"
+              f"{(result['peak_rss_bytes'] or 0) / 1e6:>9.1f} MB RSS"
+              + (f"{result['docx_bytes'] / 1e3:>10.1f} KB docx" if result['docx_bytes'] else ''))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"结果已保存到 {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
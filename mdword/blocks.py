@@ -0,0 +1,235 @@
+"""分块增量清洗
+
+把输入按段落、代码块、表格、引用等切成块，每块的清洗结果按（块内容, 选项）缓存，
+编辑时只有变化的块需要重新清洗。部分规则的匹配会跨行（标题、列表、分割线的
+\\s* 会吞掉换行，md`` 与链接可以跨行，表格清洁有跨行状态），因此只在这些规则
+都不可能跨越的位置切分，拼接结果与整篇清洗逐字节一致。
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from . import timing
+from .cleaner import clean_block, md_span_open
+from .options import Options
+
+# 候选切分点：空白行或标题行之前的换行符，group(1) 为换行前的一行（只取以字母、>、# 或 | 开头的行）
+BOUNDARY_RE = re.compile(r'(?m)^([^\S\n]*(?:[^\W\d_]|[>#|])[^\n]*)\n(?=[^\S\n]*(?:\n|\Z)|#)')
+
+# 块的最小字符数：标题密集的文档每隔一两行就有切分点，块太碎时逐块处理的开销
+# 反而超过清洗本身，较近的切分点跳过不用
+MIN_BLOCK_SIZE = 2048
+
+# 保留最近几种选项组合的分块缓存，来回切换选项时不必整篇重算
+CACHED_OPTION_SETS = 4
+
+
+def is_anchor_line(line, options):
+    """该行之后的换行是否不会被任何规则跨越
+
+    行首（去掉空白后）的字符既不会被删除、也不属于标题/列表/分割线/表格分隔行，
+    则从该行及之前开始的行首规则都无法越过它。标题行最先去掉 #+\\s*，其后的内容
+    按同样的条件判断，标题标记之后须仍有内容，\\s* 才不会越过换行。唯一会删除任意
+    字符的是链接地址，跨行的地址会删到该行第一个 ) 为止，因此启用去除链接时
+    ) 之后的内容同样须以这些字符开头。
+    """
+    tables = options.table_clean or options.table_conversion != "无"
+    if tables:
+        # 表格处理按 splitlines 分行，\r 等也会成为行首；以 \r、\u2028 等结尾的行
+        # 与其后的换行符在整篇中和切开后分出的行数不同，不能切分
+        segments = line.splitlines()
+        if line.splitlines(True)[-1:] != segments[-1:]:
+            return False
+        line = segments[-1] if segments else ''
+    if line.startswith('#'):
+        line = line.lstrip('#')
+    stripped = line.lstrip()
+    if not (stripped and is_anchor_start(stripped[0], tables)):
+        return False
+    # md`` 可能由删除其它标记后拼出，行首的 m 也可能被删掉
+    if stripped[0] == 'm' and '`' in line:
+        return False
+    # 跨行的链接地址会被整体删除，连同行首字符，删除后该行须仍以上述字符开头
+    if options.remove_links and ')' in line:
+        rest = line[line.index(')') + 1:].lstrip()
+        if not (rest and is_anchor_start(rest[0], tables)):
+            return False
+    # 表格清洁的"表格中"状态会延续到下一行
+    if options.table_clean and '|' in line:
+        return False
+    return True
+
+
+def is_anchor_start(char, tables):
+    """以该字符开头（去掉空白后）的行不会被行首规则匹配，行首字符也不会被删除
+
+    不在行首的 # 不会被删除；| 只在不处理表格时才不会被删除。
+    """
+    return char.isalpha() or char in '>#' or (char == '|' and not tables)
+
+
+def split_blocks(text, options=Options()):
+    """按安全切分点把文本切成块（块之间以单个换行符相连），返回块列表"""
+    blocks = []
+    start = 0
+    for match in BOUNDARY_RE.finditer(text):
+        end = match.end() - 1
+        if end - start >= MIN_BLOCK_SIZE and is_anchor_line(match.group(1), options):
+            blocks.append(text[start:end])
+            start = match.end()
+    blocks.append(text[start:])
+    return blocks
+
+
+def link_open(text):
+    """链接替换时文本末尾是否有未闭合的 [ 或 ](，即可能与后文跨行匹配"""
+    return text.rfind('[') > text.rfind(']') or text.rfind('](') > text.rfind(')')
+
+
+def span_open(block, cleaned, options):
+    """块末尾是否有未闭合、可能与后文跨行匹配的 md`` 或链接"""
+    return md_span_open(block) or bool(options.remove_links and link_open(cleaned))
+
+
+def clean_with_span(block, options):
+    """清洗单个块，同时返回块末尾是否有未闭合的跨行标记"""
+    cleaned = clean_block(block, options)
+    return cleaned, span_open(block, cleaned, options)
+
+
+def common_prefix(a, b):
+    """a 与 b 相同的开头部分的长度（二分查找，每次比较都在C层完成）"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix(a, b, limit):
+    """a 与 b 相同的结尾部分的长度，不超过 limit"""
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class IncrementalCleaner:
+    """带分块缓存的清洗器：只重新切分、清洗变化过的块
+
+    与上一次的输入相比，首尾未变化的块直接沿用（连字符串对象都复用，
+    缓存查找无需重新计算哈希），只对中间变化的区域重新切分和清洗。
+    缓存只保留最近一次清洗用到的块。
+    """
+
+    def __init__(self):
+        self._caches = OrderedDict()  # 选项 -> {块内容: (清洗结果, 是否有未闭合的跨行标记)}
+        self._blocks = {}             # 选项 -> 上一次的切分结果
+        self._lock = threading.Lock()
+
+    @timing.logged
+    def clean(self, text, options=Options()):
+        with self._lock:
+            previous = self._caches.pop(options, {})
+            blocks = self._split(text, options, self._blocks.pop(options, None))
+            cache = {}
+            pieces = []
+            for index, block in enumerate(blocks):
+                last = index + 1 == len(blocks)
+                entry = previous.get(block) or cache.get(block)
+                if entry is None:
+                    # 最后一块之后没有后文，不必判断末尾是否有未闭合的跨行标记（记为 None）
+                    entry = (clean_block(block, options), None) if last else clean_with_span(block, options)
+                elif entry[1] is None and not last:
+                    entry = (entry[0], span_open(block, entry[0], options))
+                cache[block] = entry
+                cleaned, open_span = entry
+                if open_span and index + 1 < len(blocks):
+                    # 块末尾未闭合的 md`` 或链接可能与后文跨行匹配：余下部分整体清洗
+                    rest = '\n'.join(blocks[index:])
+                    cleaned = (previous.get(rest) or clean_with_span(rest, options))[0]
+                    cache[rest] = (cleaned, False)
+                    pieces.append(cleaned)
+                    break
+                pieces.append(cleaned)
+
+            self._caches[options] = cache
+            self._blocks[options] = blocks
+            while len(self._caches) > CACHED_OPTION_SETS:
+                stale, _ = self._caches.popitem(last=False)
+                self._blocks.pop(stale, None)
+        return '\n'.join(pieces).strip()
+
+    def clear(self):
+        with self._lock:
+            self._caches.clear()
+            self._blocks.clear()
+
+    @staticmethod
+    def _split(text, options, old):
+        """复用上一次的切分结果，只重新切分发生变化的区域"""
+        if not old:
+            return split_blocks(text, options)
+        if len(old) == 1:
+            return _split_changed(text, options, old[0])
+
+        # 从前往后找未变化的块（块后必须紧跟换行符）
+        last = len(old) - 1
+        head, pos = 0, 0
+        while head < last and text.startswith(old[head], pos) and text.startswith('\n', pos + len(old[head])):
+            pos += len(old[head]) + 1
+            head += 1
+
+        # 从后往前找未变化的块，不能与前面的部分重叠
+        tail, end = len(old), len(text)
+        while tail > head + 1:
+            block = old[tail - 1]
+            start = end - len(block)
+            if start - 1 < pos or not text.endswith(block, start, end) or text[start - 1] != '\n':
+                break
+            end = start - 1
+            tail -= 1
+
+        # 变化区域前后各多带一块：相邻块之间的切分点取决于两侧的行，需要重新判断
+        if head > 0:
+            head -= 1
+            pos -= len(old[head]) + 1
+        if tail < len(old):
+            end += 1 + len(old[tail])
+            tail += 1
+        return old[:head] + split_blocks(text[pos:end], options) + old[tail:]
+
+
+def _split_changed(text, options, old_text):
+    """old_text 中没有切分点时切分 text：只有变化区域附近的行可能成为新的切分点
+
+    切分点只取决于该行和其后的一行，两行都在未变化的部分时，它在 old_text 中就已存在。
+    离块首不足 MIN_BLOCK_SIZE 的切分点跳过不用，只会让块更大，拼接结果不变。
+    """
+    prefix = common_prefix(old_text, text)
+    suffix = common_suffix(old_text, text, min(len(old_text), len(text)) - prefix)
+    # 从变化位置的上一行开始，到变化区域之后的一行为止
+    start = text.rfind('\n', 0, prefix)
+    start = text.rfind('\n', 0, max(start, 0)) + 1
+    stop = text.find('\n', len(text) - suffix)
+    stop = len(text) if stop < 0 else stop
+    # 查找范围再包含其后的一行（判断最后一行之后是否为空白行或标题行），不必扫描到文本末尾
+    end = text.find('\n', stop + 1)
+    end = len(text) if end < 0 else end + 1
+    blocks = []
+    pos = 0
+    for match in BOUNDARY_RE.finditer(text, start, end):
+        if match.start() > stop:
+            break
+        if match.end() - 1 - pos >= MIN_BLOCK_SIZE and is_anchor_line(match.group(1), options):
+            blocks.append(text[pos:match.end() - 1])
+            pos = match.end()
+    blocks.append(text[pos:])
+    return blocks
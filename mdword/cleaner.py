@@ -0,0 +1,420 @@
+"""Markdown清洗引擎
+
+所有正则在导入时预编译；行内规则（加粗、''、md``、斜体、删除线、高亮、链接）
+合并为一个组合正则，一遍扫描完成。清洗前先找出文本中出现了哪些触发字符，
+标记不可能出现的规则整条跳过。输出与原 process_markdown 的逐条 re.sub
+顺序逐字节一致：合并扫描后若某行仍残留标记（未闭合、相邻或互相嵌套），该行
+退回按原顺序逐条替换；被跨行的 md`` 连在一起的几行合起来逐条替换。文本中有
+md`` 或只有一条规则可合并时，合并扫描并不更快，直接逐条替换。链接规则会删除
+链接地址，放在合并扫描之后单独执行，与原顺序相同。
+"""
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from . import timing
+from .options import Options
+
+# 行首规则
+HEADING_RE = re.compile(r'^#+\s*', re.MULTILINE)
+UNORDERED_LIST_RE = re.compile(r'(?m)^\s*[-*+]\s+')
+ORDERED_LIST_RE = re.compile(r'(?m)^\s*\d+\.\s+')
+HR_RE = re.compile(r'(?m)^(?:\s*[-*_]{3,}\s*)$')
+
+# 表格规则
+TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?[\s\-:|]+\|?\s*$')
+TABLE_ALIGN_RE = re.compile(r':?-{3,}:?')
+
+# 行内规则（逐条执行时使用，与原实现完全相同）
+BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+QUOTE_RE = re.compile(r"''(.*?)''")
+MD_RE = re.compile(r"md``(.*?)``")
+MD_DOTALL_RE = re.compile(r"md``(.*?)``", re.DOTALL)
+ITALIC_STAR_RE = re.compile(r'(?<!\*)\*(?!\*)(.*?)\*(?!\*)')
+ITALIC_UNDERSCORE_RE = re.compile(r'(?<!_)_(?!_)(.*?)_(?!_)')
+STRIKETHROUGH_RE = re.compile(r'~~(.*?)~~')
+HIGHLIGHT_RE = re.compile(r'==(.+?)==')
+
+
+class LinkPattern:
+    r"""与 re.compile(r'\[([^\]]+)\]\([^)]+\)') 等价、保证线性时间的链接匹配（只提供 split）
+
+    正则在每个未闭合的 [ 或 ]( 处都要扫描到文本末尾，粘贴大量这样的文本会退化为平方级。
+    [^\]]+ 与 [^)]+ 只能停在其后第一个 ] 与 ) 处，每个 [ 的匹配结果唯一确定；
+    记住上一次找到的 ] 与 ) 的位置，整个扫描只需向前走一遍。
+    """
+    groups = 1
+
+    def split(self, text):
+        parts = []
+        pos = 0
+        close = paren = -1  # 上一次找到的 ] 和 ) 的位置
+        start = text.find('[')
+        while start >= 0:
+            if close <= start:
+                close = text.find(']', start + 1)
+                if close < 0:
+                    break  # 之后不再有 ]，后面的 [ 也都无法匹配
+            if close > start + 1 and text.startswith('(', close + 1):
+                if paren < close + 2:
+                    paren = text.find(')', close + 2)
+                    if paren < 0:
+                        break
+                if paren > close + 2:
+                    parts += (text[pos:start], text[start + 1:close])
+                    pos = paren + 1
+                    start = text.find('[', pos)
+                    continue
+            start = text.find('[', start + 1)
+        parts.append(text[pos:])
+        return parts
+
+
+LINK_RE = LinkPattern()
+
+NEWLINE_RE = re.compile(r'\n')
+
+# 各规则的触发字符：文本中一个都没有时该规则不可能匹配，直接跳过。
+# 所有规则都只删除字符（表格转换插入的空格、制表符、逗号不是触发字符），
+# 因此按清洗前的文本判断即可
+HEADING_TRIGGERS = '#'
+UNORDERED_LIST_TRIGGERS = '-*+'
+ORDERED_LIST_TRIGGERS = '.'
+HR_TRIGGERS = '-*_'
+
+# 分隔行只可能以这些字符（或空白）结尾，先看行尾字符可以省掉绝大多数正则调用
+TABLE_SEPARATOR_TAIL = frozenset('-:|')
+
+# 表格转换选项对应的分隔符
+TABLE_SEPARATORS = {"空格": "    ", "/t": "\t", ",": ","}
+
+# 行内规则定义：
+#   option   - 控制该规则的选项字段，None 表示总是启用
+#   patterns - 逐条执行时依次使用的正则
+#   fused    - 合并扫描时使用的模式（不跨行，分支以字面量开头便于快速定位）；
+#              None 表示该规则会删除标记以外的内容，在合并扫描之后单独执行
+#   trigger  - 该规则能够匹配时文本中必然出现的子串
+#   chars    - 触发字符：清洗前的文本中一个都没有时跳过该规则（删除其它标记后
+#              可能拼出新的多字符标记，所以只按单个字符判断）
+InlineRule = namedtuple('InlineRule', ['name', 'option', 'patterns', 'fused', 'trigger', 'chars'])
+
+INLINE_RULES = (
+    InlineRule('bold', None, (BOLD_RE,), r'\*\*(.*?)\*\*', '**', '*'),
+    InlineRule('quote', None, (QUOTE_RE,), r"''(.*?)''", "''", "'"),
+    InlineRule('md', None, (MD_RE, MD_DOTALL_RE), r'md``(.*?)``', 'md``', '`'),
+    InlineRule('italic_star', 'remove_italic', (ITALIC_STAR_RE,),
+               r'\*(?<!\*\*)(?!\*)(.*?)\*(?!\*)', '*', '*'),
+    InlineRule('italic_underscore', 'remove_italic', (ITALIC_UNDERSCORE_RE,),
+               r'_(?<!__)(?!_)(.*?)_(?!_)', '_', '_'),
+    InlineRule('strikethrough', 'remove_strikethrough', (STRIKETHROUGH_RE,), r'~~(.*?)~~', '~~', '~'),
+    InlineRule('highlight', 'remove_highlight', (HIGHLIGHT_RE,), r'==(.+?)==', '==', '='),
+    InlineRule('link', 'remove_links', (LINK_RE,), None, '[', '['),
+)
+
+TRIGGER_CHARS = frozenset(HEADING_TRIGGERS + UNORDERED_LIST_TRIGGERS + ORDERED_LIST_TRIGGERS + HR_TRIGGERS
+                          + ''.join(rule.chars for rule in INLINE_RULES))
+
+# md``（跨行）替换之前会执行的规则
+MD_SPAN_RULES = INLINE_RULES[:3]
+
+
+def strip_markers(pattern, text):
+    """等价于 pattern.sub(r'\\1', text)：去掉标记、保留内容分组
+
+    re.sub 遇到分组引用时每个匹配都要回到 Python 层展开模板，
+    split 再拼接则全部在 C 层完成，速度约为前者的两到三倍。
+    """
+    return ''.join(filter(None, pattern.split(text)))
+
+
+def apply_rules(text, rules):
+    """按给定顺序逐条执行行内规则（即原 process_markdown 的做法）"""
+    for rule in rules:
+        for pattern in rule.patterns:
+            text = strip_markers(pattern, text)
+    return text
+
+
+class InlinePass:
+    """把一组行内规则合并成一个组合正则，一遍扫描完成替换"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.fused_rules = tuple(rule for rule in rules if rule.fused)
+        self.trailing_rules = tuple(rule for rule in rules if not rule.fused)
+        # 分支不加外层分组，保证每个分支以字面量开头，正则引擎可按首字符集快速跳过；
+        # 每个分支只有一个内容分组，split 后未参与匹配的分组为 None，由 strip_markers 丢弃
+        self.pattern = re.compile('|'.join(rule.fused for rule in self.fused_rules))
+        self.triggers = re.compile('|'.join(re.escape(rule.trigger) for rule in self.fused_rules))
+        # 合并扫描之后还要找出残留标记所在的行，只替代一条逐条规则时反而更慢；
+        # md`` 不计在内，文本中出现 ` 就会启用
+        self.fuse = sum(rule.name != 'md' for rule in self.fused_rules) >= 2
+        # 跨行的 md``（MD_DOTALL_RE）之前执行的替换：md`` 之前的各条规则和单行的 md``，都只在行内匹配
+        names = [rule.name for rule in self.fused_rules]
+        self.span_patterns = None
+        if 'md' in names:
+            self.span_patterns = tuple(pattern for rule in self.fused_rules[:names.index('md')]
+                                       for pattern in rule.patterns) + (MD_RE,)
+
+    def sequential(self, text, rules=None):
+        """按原顺序逐条执行替换"""
+        return apply_rules(text, self.rules if rules is None else rules)
+
+    def run(self, text):
+        if self.fuse and 'md``' not in text:
+            text = self._run_fused(text)
+        else:
+            # 有 md`` 的文本常有跨行的 md``，残留标记的行多，合并扫描反而更慢
+            text = self.sequential(text, self.fused_rules)
+        return self.sequential(text, self.trailing_rules)
+
+    def _run_fused(self, text):
+        result = strip_markers(self.pattern, text)
+
+        # 合并扫描后仍残留标记（未闭合、相邻或互相嵌套）的行需要退回逐条替换
+        if not any(rule.trigger in result for rule in self.fused_rules):
+            return result
+        leftovers = [m.start() for m in self.triggers.finditer(result)]
+
+        # 合并扫描不改变换行符，输入输出行号一一对应
+        newlines = [m.start() for m in NEWLINE_RE.finditer(result)]
+        dirty_lines = {bisect_right(newlines, pos - 1) for pos in leftovers}
+        source_lines = text.split('\n')
+        result_lines = result.split('\n')
+        spans = self.span_patterns is not None   # 之后是否还可能有跨行的 md``
+        done = 0                                 # 在此之前的行已处理完
+        for index in sorted(dirty_lines):
+            if index < done:
+                continue
+            end = index + 1
+            if spans and '`' in source_lines[index]:
+                end, spans = self._md_span_end(source_lines, index)
+            # 跨行的 md`` 把这几行连在一起，合起来逐条替换；替换不增删换行符，行数不变
+            result_lines[index:end] = self.sequential('\n'.join(source_lines[index:end]),
+                                                     self.fused_rules).split('\n')
+            done = end
+        return '\n'.join(result_lines)
+
+    def _md_span_end(self, lines, start):
+        """第 start 行起被跨行的 md`` 连在一起的各行之后的行号（没有跨行的 md`` 时为 start + 1），
+        以及之后是否还可能有跨行的 md``
+
+        按 MD_DOTALL_RE 的方式扫描：md`` 到其后第一个 `` 为止，闭合后再找下一个 md``；
+        某一行结束时没有未闭合的 md``，之后的行就不受影响。到文本末尾仍未闭合的
+        md`` 不会匹配，之后也不再有 ``，其余的行都只在行内匹配。
+        """
+        opened = False
+        closed = start  # 最后一个闭合的 `` 所在的行
+        for index in range(start, len(lines)):
+            line = lines[index]
+            if line.count('`') >= 2:  # 少于两个 ` 的行既不能开始也不能闭合 md``
+                for pattern in self.span_patterns:
+                    line = strip_markers(pattern, line)
+                pos = 0
+                while True:
+                    pos = line.find('``' if opened else 'md``', pos)
+                    if pos < 0:
+                        break
+                    if opened:
+                        closed = index
+                    pos += 2 if opened else 4
+                    opened = not opened
+            if not opened:
+                return index + 1, True
+        return closed + 1, False
+
+
+def present_triggers(text):
+    """文本中出现了哪些触发字符（单字符查找在C层按内存扫描，逐个查找比逐字符遍历快得多）"""
+    return frozenset(char for char in TRIGGER_CHARS if char in text)
+
+
+def triggered(chars, present):
+    return not present.isdisjoint(chars)
+
+
+@lru_cache(maxsize=None)
+def _inline_pass(rules):
+    """按规则组合构建（并缓存）行内合并扫描器"""
+    return InlinePass(rules)
+
+
+def inline_pass(options, present=TRIGGER_CHARS):
+    """按选项和文本中出现的触发字符选出要执行的行内规则，一条都没有时返回 None"""
+    rules = tuple(rule for rule in INLINE_RULES
+                  if (rule.option is None or getattr(options, rule.option)) and triggered(rule.chars, present))
+    return _inline_pass(rules) if rules else None
+
+
+def clean_tables(text):
+    """表格清洁：移除分隔行、对齐标记和所有管道符"""
+    processed_lines = []
+    in_table = False
+    separator = TABLE_SEPARATOR_RE.match
+    for line in text.splitlines():
+        # 检测是否为表格分隔行（可能包含对齐标记 :-等）；先看行尾字符，省掉多数正则调用
+        if line and (line[-1] in TABLE_SEPARATOR_TAIL or line[-1].isspace()) and separator(line):
+            in_table = True
+            continue
+
+        if in_table and '|' in line:
+            line = line.strip()
+            if line.startswith("|"):
+                line = line[1:]
+            if line.endswith("|"):
+                line = line[:-1]
+            if '---' in line:
+                line = TABLE_ALIGN_RE.sub('', line)
+            line = line.replace("|", "")
+            line = ' '.join(line.split())
+            processed_lines.append(line)
+        else:
+            in_table = False
+            processed_lines.append(line)
+    return "\n".join(processed_lines)
+
+
+def convert_tables(text, conversion):
+    """表格转换：按选项把管道符替换为空格、制表符或逗号"""
+    replacement = TABLE_SEPARATORS.get(conversion)
+    processed_lines = []
+    separator = TABLE_SEPARATOR_RE.match
+    for line in text.splitlines():
+        # 跳过分隔行（包括对齐标记行）
+        if line and (line[-1] in TABLE_SEPARATOR_TAIL or line[-1].isspace()) and separator(line):
+            continue
+        line = line.strip()
+        if line.startswith("|"):
+            line = line[1:]
+        if line.endswith("|"):
+            line = line[:-1]
+        if replacement is not None:
+            line = line.replace("|", replacement)
+        processed_lines.append(line)
+    return "\n".join(processed_lines)
+
+
+@timing.logged
+def clean(text, options=Options()):
+    """按选项清洗Markdown文本，返回纯净文本"""
+    return clean_block(text, options).strip()
+
+
+def clean_block(text, options=Options()):
+    """执行全部清洗规则但不去除首尾空白，供分块清洗后拼接使用"""
+    timings = timing.current()
+    if timings is not None:
+        return _clean_block_timed(text, options, timings)
+
+    present = present_triggers(text)
+
+    # 移除 Markdown 标题
+    if triggered(HEADING_TRIGGERS, present):
+        text = HEADING_RE.sub('', text)
+
+    # 行内标记：加粗、''、md``（默认），斜体、删除线、高亮、链接（按选项）
+    rules = inline_pass(options, present)
+    if rules:
+        text = rules.run(text)
+
+    # 列表样式清洁：分开处理无序列表和有序列表
+    if options.remove_unordered_list and triggered(UNORDERED_LIST_TRIGGERS, present):
+        text = UNORDERED_LIST_RE.sub('', text)
+    if options.remove_ordered_list and triggered(ORDERED_LIST_TRIGGERS, present):
+        text = ORDERED_LIST_RE.sub('', text)
+
+    # 表格处理：没有 | 的文本也会被改动（删除形似分隔行的行、按 splitlines 统一换行、
+    # 表格转换还会去除每行首尾空白），不能按触发字符跳过
+    if options.table_clean:
+        text = clean_tables(text)
+    elif options.table_conversion != "无":
+        text = convert_tables(text, options.table_conversion)
+
+    # 默认去除 Markdown 分割线（如 ---、***、___ 独占一行）
+    if triggered(HR_TRIGGERS, present):
+        text = HR_RE.sub('', text)
+
+    return text
+
+
+def _counted_sub(pattern):
+    return lambda text: pattern.subn('', text)
+
+
+def _counted_rule(rule):
+    def run(text):
+        matches = 0
+        for pattern in rule.patterns:
+            parts = pattern.split(text)
+            text = ''.join(filter(None, parts))
+            matches += (len(parts) - 1) // (pattern.groups + 1)
+        return text, matches
+    return run
+
+
+def _counted_table(process):
+    # 匹配次数记为处理掉（删除或替换）的管道符数
+    def run(text):
+        result = process(text)
+        return result, text.count('|') - result.count('|')
+    return run
+
+
+def _clean_block_timed(text, options, timings):
+    """与 clean_block 相同，逐条规则计时；行内规则按原顺序逐条执行以便分别计时"""
+    measure = timings.measure
+    present = present_triggers(text)
+    if triggered(HEADING_TRIGGERS, present):
+        text = measure('heading', _counted_sub(HEADING_RE), text)
+    rules = inline_pass(options, present)
+    for rule in rules.rules if rules else ():
+        text = measure(rule.name, _counted_rule(rule), text)
+    if options.remove_unordered_list and triggered(UNORDERED_LIST_TRIGGERS, present):
+        text = measure('unordered_list', _counted_sub(UNORDERED_LIST_RE), text)
+    if options.remove_ordered_list and triggered(ORDERED_LIST_TRIGGERS, present):
+        text = measure('ordered_list', _counted_sub(ORDERED_LIST_RE), text)
+    if options.table_clean:
+        text = measure('table', _counted_table(clean_tables), text)
+    elif options.table_conversion != "无":
+        text = measure('table', _counted_table(lambda t: convert_tables(t, options.table_conversion)), text)
+    if triggered(HR_TRIGGERS, present):
+        text = measure('hr', _counted_sub(HR_RE), text)
+    return text
+
+
+def md_span_open(text):
+    """md``（跨行）替换之后文本中是否仍有未闭合的 md``，即可能与后文跨行匹配"""
+    if '`' not in text:
+        return False
+    text = HEADING_RE.sub('', text)
+    return 'md``' in apply_rules(text, MD_SPAN_RULES)
+
+
+def md_span_closes(text):
+    """之前未闭合的 md`` 能否在 text（从行首开始的后续文本）中闭合
+
+    跨行的 md`` 到其后第一个 `` 为止；在它之前执行的规则（标题、加粗、''、单行的
+    md``）都只在行内匹配，可以只对 text 执行，不必与前文合并。
+    """
+    if '`' not in text:
+        return False
+    text = apply_rules(HEADING_RE.sub('', text), MD_SPAN_RULES[:2])
+    return '``' in strip_markers(MD_RE, text)
+
+
+def link_closes(text, options):
+    """之前未闭合的 [ 能否与 text（从行首开始的后续文本）组成链接；text 中没有 ] 时返回 None
+
+    [ 到其后第一个 ] 为止，该 ] 紧跟 ( 时才可能组成链接，否则之前的 [ 都不能再匹配。
+    在链接之前执行的规则（标题和其它行内规则）除跨行的 md`` 外都只在行内匹配，
+    可以只对 text 执行；] 之后未闭合的 md`` 可能被后文的 `` 闭合而删去，同样当作可能组成链接。
+    """
+    if ']' not in text:
+        return None
+    text = HEADING_RE.sub('', text)
+    rules = inline_pass(options._replace(remove_links=False), present_triggers(text))
+    if rules:
+        text = rules.run(text)
+    close = text.find(']')
+    return text.startswith('(', close + 1) or text.startswith('md``', close + 1)
@@ -0,0 +1,265 @@
+"""命令行批量转换：python -m mdword [选项] 文件/通配符/目录...
+
+每个输入文件可输出清洗后的纯文本（.txt）和/或Word文档（.docx），
+按文件分发到进程池并行处理，单个文件失败只报告、不中断其余文件。
+处理记录保存在清单文件中，重新运行时跳过内容与选项都没有变化的文件。
+加上 --serve 则改为启动本地HTTP转换服务（见 mdword.server）。
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import timing
+from .options import Options, TABLE_CONVERSIONS
+from .server import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_BYTES, DEFAULT_MAX_QUEUE, serve
+from .stream import clean_file
+
+# 目录输入时收集的文件扩展名
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+
+# 处理记录清单的默认文件名（位于输出目录或当前目录）
+MANIFEST_NAME = '.mdword-manifest.json'
+
+# 进程池中每批最多处理的文件数
+BATCH_LIMIT = 64
+
+# 输出格式对应的扩展名
+FORMAT_SUFFIXES = {'txt': ('.txt',), 'docx': ('.docx',), 'both': ('.txt', '.docx')}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='mdword',
+        description='批量清洗Markdown文件，输出纯文本或Word文档')
+    parser.add_argument('inputs', nargs='*', help='输入文件、通配符（支持 **）或目录')
+    parser.add_argument('-o', '--output-dir', help='输出目录，默认与输入文件相同')
+    parser.add_argument('-f', '--format', choices=sorted(FORMAT_SUFFIXES), default='txt',
+                        help='输出格式（默认 txt）')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='并行进程数，默认为CPU核数；1 表示在当前进程中顺序处理')
+    parser.add_argument('--force', action='store_true', help='忽略处理记录，全部重新转换')
+    parser.add_argument('--manifest', help=f'处理记录文件路径，默认为输出目录下的 {MANIFEST_NAME}')
+
+    server = parser.add_argument_group('HTTP服务（--serve 时处理选项作为请求未给出选项时的默认值）')
+    server.add_argument('--serve', action='store_true', help='启动本地HTTP转换服务，不转换文件')
+    server.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址（默认 {DEFAULT_HOST}）')
+    server.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口（默认 {DEFAULT_PORT}）')
+    server.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                        help=f'请求体大小上限，字节（默认 {DEFAULT_MAX_BYTES}）')
+    server.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help=f'最多排队的请求数，超出时返回 503（默认 {DEFAULT_MAX_QUEUE}）')
+
+    group = parser.add_argument_group('处理选项（与界面中的选项一致）')
+    group.add_argument('--remove-italic', action='store_true', help='去除斜体')
+    group.add_argument('--remove-strikethrough', action='store_true', help='去除删除线')
+    group.add_argument('--remove-highlight', action='store_true', help='去除高亮')
+    group.add_argument('--remove-links', action='store_true', help='去除链接')
+    group.add_argument('--remove-unordered-list', action='store_true', help='清洗无序列表')
+    group.add_argument('--remove-ordered-list', action='store_true', help='清洗有序列表')
+    group.add_argument('--table-clean', action='store_true', help='表格清洁')
+    group.add_argument('--table-conversion', choices=TABLE_CONVERSIONS, default="无",
+                       help='表格转换的分隔符（默认 无）')
+    group.add_argument('--no-table-to-word', dest='table_to_word', action='store_false',
+                       help='导出Word时不把Markdown表格转换为Word表格')
+    return parser
+
+
+def collect_inputs(patterns):
+    """展开文件、通配符和目录，返回 (输入文件, 相对输出路径) 列表，去除重复"""
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(MARKDOWN_SUFFIXES):
+                        path = os.path.join(root, name)
+                        found.setdefault(os.path.abspath(path), os.path.relpath(path, pattern))
+        elif glob.has_magic(pattern):
+            # 与目录输入一样，保留相对于通配符之前那部分目录的路径
+            root = pattern
+            while glob.has_magic(root):
+                root = os.path.dirname(root)
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found.setdefault(os.path.abspath(path), os.path.relpath(path, root or '.'))
+        else:
+            # 普通路径原样保留，不存在时由转换过程报告错误
+            found.setdefault(os.path.abspath(pattern), os.path.basename(pattern))
+    return list(found.items())
+
+
+def output_paths(source, relative, output_dir, fmt):
+    base = os.path.splitext(os.path.join(output_dir, relative) if output_dir else source)[0]
+    return [base + suffix for suffix in FORMAT_SUFFIXES[fmt]]
+
+
+def same_file(source, target):
+    """target 是否就是 source（写出 target 会覆盖输入）"""
+    if os.path.normcase(os.path.abspath(target)) == os.path.normcase(source):
+        return True
+    try:
+        return os.path.samefile(source, target)
+    except OSError:
+        return False  # 任一文件还不存在
+
+
+def convert_file(source, targets, options):
+    """转换单个文件，在工作进程中执行"""
+    for target in targets:
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        if target.endswith('.docx'):
+            from .export import to_docx
+            with open(source, encoding='utf-8-sig') as f:
+                to_docx(f.read(), options, target)
+        else:
+            # 纯文本逐块清洗写出，大文件也不必整篇读入内存
+            clean_file(source, target, options)
+    return source
+
+
+def convert_batch(batch, options):
+    """在工作进程中依次转换一批文件，返回 (输入, 输出, 错误信息) 列表
+
+    小文件逐个提交时进程间通信的开销会超过转换本身，按批提交才能随核数线性扩展。
+    """
+    if timing.LOG_ENABLED:
+        # 工作进程不继承日志配置，需要在这里配置才能看到每个文件的耗时
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    results = []
+    for source, targets in batch:
+        try:
+            convert_file(source, targets, options)
+            results.append((source, targets, None))
+        except Exception as e:
+            results.append((source, targets, str(e)))
+    return results
+
+
+def batches(jobs, workers):
+    """把任务切成若干批：每个进程约分到四批，便于负载均衡，单批不超过 BATCH_LIMIT 个文件"""
+    size = max(1, min(BATCH_LIMIT, len(jobs) // (workers * 4)))
+    return [jobs[i:i + size] for i in range(0, len(jobs), size)]
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def fingerprint(source, targets, options):
+    """输入文件的大小和修改时间，加上选项与输出路径；任何一项变化都需要重新转换"""
+    stat = os.stat(source)
+    return [stat.st_size, stat.st_mtime_ns, list(options), targets]
+
+
+def is_unchanged(manifest, source, targets, options):
+    try:
+        return (manifest.get(source) == fingerprint(source, targets, options)
+                and all(os.path.exists(target) for target in targets))
+    except OSError:
+        return False
+
+
+def options_from_args(args):
+    return Options(
+        remove_italic=args.remove_italic,
+        remove_strikethrough=args.remove_strikethrough,
+        remove_highlight=args.remove_highlight,
+        remove_links=args.remove_links,
+        remove_unordered_list=args.remove_unordered_list,
+        remove_ordered_list=args.remove_ordered_list,
+        table_clean=args.table_clean,
+        table_conversion=args.table_conversion,
+        table_to_word=args.table_to_word,
+    )
+
+
+def run(args):
+    options = options_from_args(args)
+    manifest_path = args.manifest or os.path.join(args.output_dir or '.', MANIFEST_NAME)
+    manifest = {} if args.force else load_manifest(manifest_path)
+
+    jobs = []
+    skipped = 0
+    rejected = 0
+    owners = {}  # 输出文件 -> 输入文件
+    for source, relative in collect_inputs(args.inputs):
+        targets = output_paths(source, relative, args.output_dir, args.format)
+        if any(same_file(source, target) for target in targets):
+            # 如不带 -o 时 -f txt 转换 .txt 文件：写出会先清空输入
+            rejected += 1
+            print(f"转换失败: {source}: 输出文件与输入文件相同，请用 -o 指定输出目录", file=sys.stderr)
+            continue
+        for target in targets:
+            other = owners.setdefault(os.path.normcase(os.path.abspath(target)), source)
+            if other != source:
+                print(f"错误: {other} 和 {source} 的输出文件相同: {target}", file=sys.stderr)
+                return 1
+        if is_unchanged(manifest, source, targets, options):
+            skipped += 1
+        else:
+            jobs.append((source, targets))
+
+    failed = rejected
+
+    def finished(source, targets, error):
+        nonlocal failed
+        if error is None:
+            manifest[source] = fingerprint(source, targets, options)
+            print(f"已转换: {source}")
+        else:
+            failed += 1
+            manifest.pop(source, None)
+            print(f"转换失败: {source}: {error}", file=sys.stderr)
+
+    try:
+        if args.jobs <= 1 or len(jobs) <= 1:
+            for source, targets in jobs:
+                finished(*convert_batch([(source, targets)], options)[0])
+        else:
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                futures = {executor.submit(convert_batch, batch, options): batch
+                           for batch in batches(jobs, args.jobs)}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    if error is not None:
+                        # 工作进程异常退出，整批记为失败
+                        for source, targets in futures[future]:
+                            finished(source, targets, error)
+                        continue
+                    for result in future.result():
+                        finished(*result)
+    finally:
+        # 中断时也保存已完成的记录，下次运行从中断处继续
+        save_manifest(manifest_path, manifest)
+
+    print(f"完成: 转换 {len(jobs) - failed + rejected} 个，跳过未变化的 {skipped} 个，失败 {failed} 个")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error('--jobs 必须大于 0')
+    if args.serve:
+        return serve(args.host, args.port, args.jobs, options_from_args(args), args.max_bytes, args.max_queue)
+    if not args.inputs:
+        parser.error('需要输入文件、通配符或目录（或使用 --serve 启动HTTP服务）')
+    return run(args)
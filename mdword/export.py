@@ -0,0 +1,182 @@
+"""Word导出：把Markdown文本转换为docx文档
+
+依赖 python-docx，只在真正导出时才由 mdword.to_docx 导入本模块，
+清洗功能不受影响。文本先由 mdword.tree 解析为文档树，再由 mdword.ooxml
+直接写出正文XML；python-docx 只用来生成设置好样式的模板文档。
+"""
+import io
+import os
+from functools import lru_cache
+
+from docx import Document  # Word文档处理库
+from docx.shared import Pt, Inches, RGBColor, Twips
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn, nsdecls
+
+from .ooxml import Template, write_docx
+from .tree import parse
+
+BLACK_COLOR = RGBColor(0, 0, 0)  # 黑色
+BLUE_COLOR = RGBColor(0, 0, 255)  # 蓝色
+
+# 行内代码字符样式、引用块段落样式的底纹
+SHADING_XML = '<w:shd %s w:val="clear" w:color="auto" w:fill="{}"/>' % nsdecls('w')
+
+# 引用块段落样式左侧的灰色竖线
+QUOTE_BORDER_XML = '<w:pBdr %s><w:left w:val="single" w:sz="8" w:space="12" w:color="CCCCCC"/></w:pBdr>' % nsdecls('w')
+
+# 行内格式的字符样式（mdword.ooxml 按去掉空格的样式ID引用）
+BOLD_STYLE = 'Bold Emphasis'
+QUOTED_STYLE = 'Quoted Text'
+INLINE_CODE_STYLE = 'Inline Code'
+LANGUAGE_STYLE = 'Code Language'
+
+
+def to_docx(text, options, out, tree=None, progress=None):
+    """按选项把Markdown文本导出为Word文档，out 为文件路径、可写的文件描述符（int，写完不关闭）
+    或可写的二进制文件对象（BytesIO、socket.makefile('wb') 等，不能定位的流也可以）；
+    tree 为已解析好的文档树（如界面预览时 DocumentParser 得到的），省略时重新解析；
+    progress(已写出的块数, 总块数) 报告进度，在其中抛出异常即可取消导出
+
+    写入文件路径时先写到同目录的临时文件，完成后才替换目标文件，出错或取消时原文件不受影响。
+    """
+    if tree is None:
+        tree = parse(text, options)
+    if not isinstance(out, (str, os.PathLike)):
+        return write_docx(tree, _template(), out, progress)
+    temp_path = os.fspath(out) + '.tmp'
+    try:
+        write_docx(tree, _template(), temp_path, progress)
+        os.replace(temp_path, out)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return out
+
+
+def to_docx_bytes(text, options, tree=None):
+    """按选项把Markdown文本导出为 .docx 文件内容（bytes），不经过临时文件"""
+    buffer = io.BytesIO()
+    to_docx(text, options, buffer, tree)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _template():
+    """设置好样式的空白文档，作为直接写出正文时的模板"""
+    return Template(_base_document())
+
+
+@lru_cache(maxsize=None)
+def _base_document():
+    """设置好样式的空白文档保存后的字节；样式是固定的，每个进程只生成一次"""
+    buffer = io.BytesIO()
+    _styled_document().save(buffer)
+    return buffer.getvalue()
+
+
+def _styled_document():
+    """创建设置好基本样式（宋体正文、黑体标题，代码、引用、表头、分割线段落样式和行内格式字符样式）的空白文档"""
+    # 创建Word文档
+    doc = Document()
+
+    # 设置基本样式
+    doc.styles['Normal'].font.name = '宋体'
+    doc.styles['Normal'].font.size = Pt(12)
+    # 确保中文字体名称可以识别
+    doc.styles['Normal']._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+
+    normal_style = doc.styles['Normal']
+
+    # 代码块段落样式：等宽字体、深灰色，上下留白（代码块放在浅灰底纹的单元格中）
+    if 'Code' not in doc.styles:
+        code_style = doc.styles.add_style('Code', WD_STYLE_TYPE.PARAGRAPH)
+        code_style.base_style = normal_style
+        code_style.font.name = 'Courier New'
+        code_style.font.size = Pt(10)
+        code_style.font.color.rgb = RGBColor(80, 80, 80)
+        code_style.paragraph_format.left_indent = Inches(0.3)
+        code_style.paragraph_format.space_before = Pt(6)
+        code_style.paragraph_format.space_after = Pt(6)
+
+    # 设置标题样式：黑体、黑色、加粗
+    for i in range(1, 10):  # Word支持9级标题
+        heading_name = f'Heading {i}'
+        if heading_name in doc.styles:
+            heading_style = doc.styles[heading_name]
+            # 明确设置黑体字
+            heading_style.font.name = '黑体'
+            # 确保中文字体名称可以识别，有些环境可能需要英文字体名
+            rFonts = heading_style._element.rPr.rFonts
+            rFonts.set(qn('w:eastAsia'), '黑体')
+            # 去掉主题字体，否则Word优先使用主题字体而不是黑体
+            for attribute in ('w:asciiTheme', 'w:hAnsiTheme', 'w:eastAsiaTheme', 'w:cstheme'):
+                rFonts.attrib.pop(qn(attribute), None)
+            heading_style.font.bold = True  # 加粗
+            heading_style.font.italic = False  # 不斜体
+            # 确保标题字体颜色为黑色
+            heading_style.font.color.rgb = BLACK_COLOR  # 使用常量
+
+    # 表头段落样式：黑体、加粗、居中
+    header_style = doc.styles.add_style('Table Header', WD_STYLE_TYPE.PARAGRAPH)
+    header_style.base_style = normal_style
+    header_style.font.name = '黑体'
+    header_style._element.rPr.rFonts.set(qn('w:eastAsia'), '黑体')
+    header_style.font.bold = True
+    header_style.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # 分隔线段落样式：上下留白、不缩进，浅灰色
+    rule_style = doc.styles.add_style('Horizontal Rule', WD_STYLE_TYPE.PARAGRAPH)
+    rule_style.base_style = normal_style
+    rule_style.font.color.rgb = RGBColor(200, 200, 200)
+    rule_style.paragraph_format.left_indent = Inches(0)
+    rule_style.paragraph_format.right_indent = Inches(0)
+    rule_style.paragraph_format.space_before = Pt(10)
+    rule_style.paragraph_format.space_after = Pt(10)
+
+    # 引用块段落样式：浅灰底纹、左侧灰色竖线，左右缩进（右缩进使引用块宽 5.5 英寸）；
+    # 默认模板中已有 Quote 样式，去掉其中的斜体
+    if 'Quote' in doc.styles:
+        quote_style = doc.styles['Quote']
+    else:
+        quote_style = doc.styles.add_style('Quote', WD_STYLE_TYPE.PARAGRAPH)
+        quote_style.base_style = normal_style
+    # 边框和底纹在 <w:pPr> 中要排在间距和缩进之前，先加入
+    quote_format = quote_style._element.get_or_add_pPr()
+    quote_format.append(parse_xml(QUOTE_BORDER_XML))
+    quote_format.append(parse_xml(SHADING_XML.format('F8F8F8')))
+    quote_style.paragraph_format.left_indent = Twips(300)
+    quote_style.paragraph_format.right_indent = Inches(0.5)
+    quote_style.paragraph_format.space_before = Pt(6)
+    quote_style.paragraph_format.space_after = Pt(6)
+    quote_style.font.italic = None
+    quote_style.font.color.rgb = BLACK_COLOR
+    quote_style._element.get_or_add_rPr()._remove_iCs()
+
+    # 行内格式的字符样式：正文中的文字只引用样式，普通文字直接继承正文的宋体
+    bold_style = doc.styles.add_style(BOLD_STYLE, WD_STYLE_TYPE.CHARACTER)
+    bold_style.font.name = '黑体'
+    bold_style._element.rPr.rFonts.set(qn('w:eastAsia'), '黑体')
+    bold_style.font.bold = True
+
+    quoted_style = doc.styles.add_style(QUOTED_STYLE, WD_STYLE_TYPE.CHARACTER)
+    quoted_style.font.color.rgb = BLUE_COLOR
+
+    inline_code_style = doc.styles.add_style(INLINE_CODE_STYLE, WD_STYLE_TYPE.CHARACTER)
+    inline_code_style.font.name = 'Courier New'
+    inline_code_style.font.size = Pt(10)
+    inline_code_style.font.color.rgb = RGBColor(80, 80, 80)
+    inline_code_style._element.rPr.append(parse_xml(SHADING_XML.format('F5F5F5')))
+
+    # 代码块的语言标记：宋体、加粗、灰色小字
+    language_style = doc.styles.add_style(LANGUAGE_STYLE, WD_STYLE_TYPE.CHARACTER)
+    language_style.font.name = '宋体'
+    language_style._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+    language_style.font.bold = True
+    language_style.font.size = Pt(9)
+    language_style.font.color.rgb = RGBColor(100, 100, 100)
+
+    return doc
@@ -0,0 +1,110 @@
+"""界面字体子集：只含常用字符的思源黑体，启动时代替完整字体
+
+子集包含 ASCII、Latin-1、常用标点和全角符号，以及 GB2312 的全部字符（界面上的
+文字都在其中）；文本中出现子集之外的字符时，界面再改用完整字体（见 outside_subset）。
+
+    path = find_subset(完整字体路径, [目录, ...])    # 已有的子集，没有时为 None
+    build_subset(完整字体路径, cache_dir())          # 生成子集，需要 fontTools
+
+生成子集依赖 fontTools，只在 build_subset 中导入；没有安装时界面使用完整字体。
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+# 子集包含的字符有变化时递增，旧的缓存文件随之失效
+SUBSET_VERSION = 1
+
+# 除 GB2312 外子集包含的字符范围
+SUBSET_RANGES = [
+    (0x09, 0x0d),       # 制表符、换行等
+    (0x20, 0x7e),       # ASCII
+    (0xa0, 0xff),       # Latin-1
+    (0x2000, 0x206f),   # 通用标点
+    (0x3000, 0x303f),   # 中日韩符号和标点
+    (0xff00, 0xffef),   # 全角字符
+]
+
+
+@lru_cache(maxsize=None)
+def subset_characters():
+    """子集包含的全部字符"""
+    chars = {chr(code) for low, high in SUBSET_RANGES for code in range(low, high + 1)}
+    for first in range(0xa1, 0xf8):
+        for second in range(0xa1, 0xff):
+            try:
+                chars.add(bytes((first, second)).decode('gb2312'))
+            except UnicodeDecodeError:
+                pass
+    return frozenset(chars)
+
+
+@lru_cache(maxsize=None)
+def _outside_subset_re():
+    # 把字符合并为连续的区间，写成一个否定的字符类
+    ranges = []
+    for code in sorted(map(ord, subset_characters())):
+        if ranges and ranges[-1][1] == code - 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    parts = ''.join(re.escape(chr(low)) if low == high else f"{re.escape(chr(low))}-{re.escape(chr(high))}"
+                    for low, high in ranges)
+    return re.compile(f"[^{parts}]")
+
+
+def outside_subset(text):
+    """text 中是否有子集之外的字符（需要完整字体才能显示）"""
+    return _outside_subset_re().search(text) is not None
+
+
+def subset_name(font_path):
+    """font_path 的子集文件名；由字体文件大小和 SUBSET_VERSION 决定，换了字体或字符范围时随之改变"""
+    stem, ext = os.path.splitext(os.path.basename(font_path))
+    key = f"{os.path.getsize(font_path)}:{SUBSET_VERSION}".encode('ascii')
+    return f"{stem}.subset-{hashlib.sha1(key).hexdigest()[:8]}{ext}"
+
+
+def cache_dir():
+    """生成的子集的默认存放目录"""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'mdword', 'fonts')
+
+
+def find_subset(font_path, directories):
+    """在 directories 中依次查找 font_path 的子集，找不到时返回 None"""
+    name = subset_name(font_path)
+    for directory in directories:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build_subset(font_path, directory):
+    """在 directory 中生成 font_path 的子集并返回其路径；先写临时文件，完成后才改名"""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    font = subset.load_font(font_path, options)
+    try:
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=''.join(subset_characters()))
+        subsetter.subset(font)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, subset_name(font_path))
+        temp_path = path + '.tmp'
+        try:
+            subset.save_font(font, temp_path, options)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    finally:
+        font.close()
+    return path
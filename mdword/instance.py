@@ -0,0 +1,158 @@
+"""单实例：已有界面在运行时，再次启动只把请求交给它后立即退出
+
+运行中的实例在 127.0.0.1 的随机端口上监听（InstanceServer），把端口和随机口令写入
+用户缓存目录下的 instance.json；再次启动时 forward() 读取该文件连接过去，发送一行
+JSON 请求 {"token", "command", "argument"}，收到一行 JSON 回复 {"ok", "error"}。
+只依赖标准库，在导入 kivy 之前调用，转交请求只需几毫秒。
+
+命令（见 COMMANDS）：
+    show             显示并前置窗口
+    open 路径        读取文件到输入框并显示窗口
+    clean-clipboard  按当前选项清洗剪贴板中的文本，结果写回剪贴板
+"""
+import hmac
+import json
+import os
+import secrets
+import socket
+import threading
+
+COMMANDS = ('show', 'open', 'clean-clipboard')
+
+# 连接运行中实例的超时（秒）；实例已退出而文件残留时连接会立即被拒绝
+CONNECT_TIMEOUT = 0.5
+
+# 等待运行中的实例处理完请求的超时（秒）
+REPLY_TIMEOUT = 10
+
+# 一行请求的长度上限（字节）
+MAX_REQUEST = 64 * 1024
+
+
+def app_dir():
+    """本用户的 mdword 数据目录，与字体子集等缓存的位置无关"""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'mdword')
+
+
+def instance_file():
+    """记录运行中实例端口和口令的文件"""
+    return os.path.join(app_dir(), 'instance.json')
+
+
+class InstanceError(Exception):
+    """运行中的实例处理请求失败"""
+
+
+def forward(command, argument=None):
+    """把请求交给运行中的实例；成功时返回 True，没有运行中的实例时返回 False，
+    实例处理失败时抛出 InstanceError"""
+    try:
+        with open(instance_file(), encoding='utf-8') as f:
+            info = json.load(f)
+        connection = socket.create_connection(('127.0.0.1', info['port']), timeout=CONNECT_TIMEOUT)
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    request = {'token': info.get('token'), 'command': command, 'argument': argument}
+    with connection:
+        try:
+            connection.settimeout(REPLY_TIMEOUT)
+            connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            reply = json.loads(connection.makefile('rb').readline() or b'null')
+        except (OSError, ValueError):
+            # 连上了却没有正常回复（如实例正在退出），当作没有运行中的实例
+            return False
+    if not isinstance(reply, dict):
+        return False
+    if not reply.get('ok'):
+        raise InstanceError(reply.get('error') or '未知错误')
+    return True
+
+
+class InstanceServer:
+    """在后台线程上接收再次启动转交来的请求
+
+    handle(命令, 参数) 处理请求，出错时抛出异常；它经 post 在调用方线程上执行
+    （Kivy 下传入 Clock.schedule_once），处理完成后才回复请求方。
+    """
+
+    def __init__(self, handle, post=None):
+        self.handle = handle
+        self.post = post or (lambda callback: callback(0))
+        self.token = secrets.token_hex(16)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._socket.getsockname()[1]
+
+    def start(self):
+        """开始接收请求，并写入实例文件（先写临时文件再改名，请求方不会读到一半的内容）"""
+        path = instance_file()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        # 只有当前用户可读，其他用户拿不到口令
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+            json.dump({'port': self.port, 'token': self.token, 'pid': os.getpid()}, f)
+        os.replace(temp_path, path)
+        self._thread = threading.Thread(target=self._serve, name='mdword-instance', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """停止接收请求；实例文件仍指向本实例时删除它"""
+        self._socket.close()
+        try:
+            with open(instance_file(), encoding='utf-8') as f:
+                owned = json.load(f).get('pid') == os.getpid()
+            if owned:
+                os.remove(instance_file())
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return  # close() 之后
+            threading.Thread(target=self._answer, args=(connection,), daemon=True).start()
+
+    def _answer(self, connection):
+        with connection:
+            try:
+                connection.settimeout(REPLY_TIMEOUT)
+                line = connection.makefile('rb').readline(MAX_REQUEST)
+                request = json.loads(line)
+                if not hmac.compare_digest(str(request.get('token')), self.token):
+                    raise InstanceError('口令错误')
+                if request.get('command') not in COMMANDS:
+                    raise InstanceError(f"未知命令: {request.get('command')}")
+                error = self._call(request['command'], request.get('argument'))
+                reply = {'ok': error is None, 'error': error}
+            except (ValueError, TypeError, AttributeError, InstanceError) as e:
+                reply = {'ok': False, 'error': f"请求无效: {str(e)}"}
+            except OSError:
+                return
+            try:
+                connection.sendall(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+            except OSError:
+                pass
+
+    def _call(self, command, argument):
+        """经 post 执行 handle 并等待完成，返回错误信息（成功时为 None）"""
+        done = threading.Event()
+        result = ['处理超时']
+
+        def call(dt):
+            try:
+                self.handle(command, argument)
+                result[0] = None
+            except Exception as e:
+                result[0] = f"处理失败: {str(e)}"
+            done.set()
+        self.post(call)
+        done.wait(REPLY_TIMEOUT)
+        return result[0]
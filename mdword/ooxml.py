@@ -0,0 +1,349 @@
+"""直接写出 word/document.xml 的Word导出
+
+python-docx 每个段落、文字片段和单元格都要创建若干 Python 代理对象和 lxml 元素，
+整篇文档在内存中建好后才能保存；几万段的文档要几分钟、占用几个GB内存。这里
+遍历文档树（见 mdword.tree），把正文XML边生成边压缩写入 .docx，样式、编号等
+其余部件直接从模板中复制。
+
+只依赖标准库；模板（设置好样式的空白文档）由 mdword.export 用 python-docx 生成。
+"""
+import io
+import os
+import re
+import zipfile
+from collections import namedtuple
+from functools import lru_cache
+
+from .tree import Blank, Code, Heading, ListItem, Paragraph, Quote, Rule, Table, LINE_BREAK, merge_runs
+
+DOCUMENT_PART = 'word/document.xml'
+
+# 每积累这么多字符的XML就压缩写出一次
+FLUSH_SIZE = 1 << 16
+
+# 与 lxml 相同：XML中不允许出现的字符
+INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+INVALID_XML_MESSAGE = "All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters"
+
+# 文字片段中的制表符和换行分别写为 <w:tab/> 和 <w:br/>（与 python-docx 的 add_run 相同）
+RUN_BREAK_RE = re.compile('([\t\r\n])')
+
+EMUS_PER_TWIP = 635
+
+# Word 只有 Heading1-Heading9 样式，更深的标题按9级输出
+MAX_HEADING_LEVEL = 9
+
+# 引用块中的标题字号为 13 - 级别（磅），级别很深时不小于这个字号
+MIN_QUOTE_HEADING_SIZE = 6
+
+# 文字片段格式：字符样式，以及少数仍直接设置的字体、颜色、字号（半磅）
+RunProps = namedtuple('RunProps', ['style', 'fonts', 'color', 'size'])
+PLAIN = RunProps(None, None, None, None)
+
+# 行内格式类型（见 mdword.tree.Run）对应的格式，字符样式由 mdword.export 在模板中定义
+RUN_PROPS = {
+    'normal': PLAIN,
+    'bold': PLAIN._replace(style='BoldEmphasis'),
+    'quote': PLAIN._replace(style='QuotedText'),
+    'code': PLAIN._replace(style='InlineCode'),
+    'symbol': PLAIN._replace(fonts='Symbol'),
+    'plain': PLAIN,
+}
+LANGUAGE_PROPS = PLAIN._replace(style='CodeLanguage')
+CELL_CODE_PROPS = PLAIN._replace(fonts='Courier New', color='505050', size=18)
+
+TABLE_LOOK = ('<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+              'w:noHBand="0" w:noVBand="1" w:val="04A0"/>')
+CODE_BORDERS = ('<w:tcBorders><w:top w:val="nil"/><w:left w:val="nil"/><w:bottom w:val="nil"/>'
+                '<w:right w:val="nil"/></w:tcBorders>')
+QUOTE_CODE_MARGIN = '<w:tcMar><w:left w:w="400" w:type="dxa"/></w:tcMar>'
+
+# 单元格底纹只有固定的几种颜色
+CODE_SHADING = '<w:shd w:val="clear" w:color="auto" w:fill="F5F5F5"/>'
+CELL_QUOTE_SHADING = '<w:shd w:val="clear" w:color="auto" w:fill="F0F8FF"/>'
+HEADER_SHADING = '<w:shd w:val="clear" w:color="auto" w:fill="EEEEEE"/>'
+
+# 表格表头：表头段落样式；表头行在每一页顶部重复
+HEADER_PARAGRAPH = '<w:pStyle w:val="TableHeader"/>'
+HEADER_ROW_START = '<w:tr><w:trPr><w:tblHeader/></w:trPr>'
+
+# 代码块单元格的全部属性预先拼好，每个块直接引用，不再逐次拼接
+CODE_CELL = CODE_BORDERS + CODE_SHADING
+QUOTE_CODE_CELL = CODE_BORDERS + CODE_SHADING + QUOTE_CODE_MARGIN
+
+# 引用块段落：底纹、竖线和缩进都在模板的引用段落样式中
+QUOTE_PARAGRAPH = '<w:pStyle w:val="Quote"/>'
+
+
+class Template:
+    """模板 .docx：除正文以外的各部件，以及正文XML中 <w:body> 之前和 <w:sectPr> 开始的部分"""
+
+    def __init__(self, data):
+        self.parts = []
+        with zipfile.ZipFile(io.BytesIO(data)) as package:
+            for name in package.namelist():
+                self.parts.append((name, package.read(name)))
+        document = dict(self.parts)[DOCUMENT_PART]
+        body = document.index(b'<w:body>') + len(b'<w:body>')
+        self.head = document[:body]
+        self.tail = document[document.index(b'<w:sectPr', body):]
+        self.block_width = _block_width(self.tail.decode('utf-8'))
+        # 除正文以外的部件预先压缩成一个 .docx，导出时复制它再追加正文，不必每次重新压缩
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as package:
+            for name, data in self.parts:
+                if name != DOCUMENT_PART:
+                    package.writestr(name, data)
+        self.package = buffer.getvalue()
+
+
+def _block_width(section_xml):
+    """页面宽度减去左右页边距（EMU），缺省值与 python-docx 相同"""
+    def twips(pattern, default):
+        match = re.search(pattern, section_xml)
+        return int(match.group(1)) * EMUS_PER_TWIP if match else default
+    page_width = twips(r'<w:pgSz\b[^>]*\bw:w="(\d+)"', 7772400)
+    left_margin = twips(r'<w:pgMar\b[^>]*\bw:left="(\d+)"', 914400)
+    right_margin = twips(r'<w:pgMar\b[^>]*\bw:right="(\d+)"', 914400)
+    return page_width - left_margin - right_margin
+
+
+def write_docx(tree, template, out, progress=None):
+    """把文档树写成 .docx，out 为文件路径、可写的文件描述符（int，写完不关闭）或可写的二进制文件对象
+
+    progress(已写出的块数, 总块数) 在每次压缩写出后调用；它抛出的异常会中止导出。
+    """
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'w+b') as stream:
+            _append_document(tree, template, stream, progress)
+    elif isinstance(out, int):
+        # 文件描述符可能只写（如 Android 以 "w" 打开的 ParcelFileDescriptor），按顺序写入
+        with os.fdopen(out, 'wb', closefd=False) as stream:
+            write_docx(tree, template, stream, progress)
+    elif out.seekable() and out.readable():
+        _append_document(tree, template, out, progress)
+    else:
+        # 只能顺序写入的流：逐个压缩写出各部件
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as package:
+            for name, data in template.parts:
+                if name == DOCUMENT_PART:
+                    _write_document(package, tree, template, progress)
+                else:
+                    package.writestr(name, data)
+    return out
+
+
+def _append_document(tree, template, stream, progress):
+    """复制模板中预先压缩好的其余部件，再把正文追加到包的末尾"""
+    stream.write(template.package)
+    stream.truncate()
+    with zipfile.ZipFile(stream, 'a', zipfile.ZIP_DEFLATED) as package:
+        _write_document(package, tree, template, progress)
+
+
+def _write_document(package, tree, template, progress):
+    with package.open(DOCUMENT_PART, 'w') as part:
+        part.write(template.head)
+        _write_body(part, tree, template.block_width, progress)
+        part.write(template.tail)
+
+
+def _write_body(part, tree, block_width, progress=None):
+    writer = _BodyWriter(block_width)
+    pending = []
+    size = 0
+    for done, node in enumerate(tree, 1):
+        for xml in NODE_WRITERS[type(node)](writer, node):
+            pending.append(xml)
+            size += len(xml)
+        if size >= FLUSH_SIZE:
+            part.write(''.join(pending).encode('utf-8'))
+            pending = []
+            size = 0
+            if progress is not None:
+                progress(done, len(tree))
+    part.write(''.join(pending).encode('utf-8'))
+    if progress is not None:
+        progress(len(tree), len(tree))
+
+
+class _BodyWriter:
+    """生成各节点的XML；表格列宽取决于模板的版心宽度"""
+
+    def __init__(self, block_width):
+        self.block_width = block_width
+
+    def blank(self, node):
+        yield '<w:p/>'
+
+    def rule(self, node):
+        yield '<w:p><w:pPr><w:pStyle w:val="HorizontalRule"/></w:pPr>' + _run(PLAIN, '_' * 70) + '</w:p>'
+
+    def heading(self, node):
+        level = min(node.level, MAX_HEADING_LEVEL)
+        run = _run(PLAIN, node.text) if node.text else ''
+        yield f'<w:p><w:pPr><w:pStyle w:val="Heading{level}"/></w:pPr>{run}</w:p>'
+
+    def list_item(self, node):
+        style = 'ListNumber' if node.ordered else 'ListBullet'
+        yield f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr>{_runs(node.runs)}</w:p>'
+
+    def paragraph(self, node):
+        yield _paragraph('', _runs(node.runs))
+
+    def code(self, node):
+        paragraph = _paragraph('<w:pStyle w:val="Code"/>', _code_runs(node, PLAIN))
+        yield self._single_cell_table(CODE_CELL, paragraph, autofit=True)
+
+    def quote(self, node):
+        runs = []
+        pending = []  # 尚未写出的格式片段，写出前合并相邻的同格式片段
+        code_tables = []
+        for index, item in enumerate(node.items):
+            if index > 0:
+                pending.append(LINE_BREAK)
+            if isinstance(item, Code):
+                # 代码块表格在引用块段落之后
+                paragraph = _paragraph('<w:pStyle w:val="Code"/><w:ind w:left="0"/>', _code_runs(item, PLAIN))
+                code_tables.append(self._single_cell_table(QUOTE_CODE_CELL, paragraph, autofit=True))
+            elif isinstance(item, Heading):
+                runs.append(_runs(merge_runs(pending)))
+                pending = []
+                content = _run_content(item.text)
+                size = max(13 - item.level, MIN_QUOTE_HEADING_SIZE)
+                runs.append(f'<w:r>{_run_properties(RUN_PROPS["bold"]._replace(size=size * 2))}{content}</w:r>')
+            else:
+                pending.extend(item.runs)
+        runs.append(_runs(merge_runs(pending)))
+        yield _paragraph(QUOTE_PARAGRAPH, ''.join(runs))
+        yield from code_tables
+
+    def table(self, node):
+        rows = node.rows
+        cols_count = max(len(row) for row in rows)
+        width = _column_twips(self.block_width, cols_count)
+        # 同一表格中各单元格宽度相同，开始部分只拼一次
+        cell_start = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/>'
+        empty_cell = cell_start + '</w:tcPr><w:p/></w:tc>'
+        yield _table_start(width, cols_count)
+        for i, row in enumerate(rows):
+            header = node.has_header and i == 0
+            cells = []
+            for cell in row:
+                properties = ''
+                paragraph_properties = ''
+                if cell.kind == 'quote':
+                    paragraph_properties = '<w:ind w:left="144"/>'
+                    properties = CELL_QUOTE_SHADING
+                    runs = [(RUN_PROPS[run.kind], run.text) for run in cell.content]
+                elif cell.kind == 'code':
+                    runs = _code_run_list(cell.content, CELL_CODE_PROPS)
+                    properties = CODE_SHADING
+                else:
+                    runs = [(RUN_PROPS[run.kind], run.text) for run in cell.content]
+                # 表头：表头段落样式，浅灰底纹
+                if header:
+                    paragraph_properties = HEADER_PARAGRAPH + paragraph_properties
+                    properties += HEADER_SHADING
+                cells.append(f'{cell_start}{properties}</w:tcPr>'
+                             + _paragraph(paragraph_properties, ''.join(_run(props, text) for props, text in runs))
+                             + '</w:tc>')
+            cells.append(empty_cell * (cols_count - len(row)))
+            yield (HEADER_ROW_START if header else '<w:tr>') + ''.join(cells) + '</w:tr>'
+        yield '</w:tbl><w:p/>'
+
+    def _single_cell_table(self, properties, paragraph, autofit=False):
+        width = _column_twips(self.block_width, 1)
+        return (_table_start(width, 1, autofit)
+                + f'<w:tr><w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/>{properties}</w:tcPr>'
+                + paragraph + '</w:tc></w:tr></w:tbl>')
+
+
+def _column_twips(block_width, cols_count):
+    """python-docx 把版心宽度平均分给各列"""
+    return int(round((block_width // cols_count) / EMUS_PER_TWIP))
+
+
+def _table_start(width, cols_count, autofit=False):
+    return ('<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+            + ('<w:tblLayout w:type="autofit"/>' if autofit else '')
+            + TABLE_LOOK + '</w:tblPr><w:tblGrid>'
+            + f'<w:gridCol w:w="{width}"/>' * cols_count + '</w:tblGrid>')
+
+
+def _paragraph(properties, runs):
+    if properties:
+        properties = f'<w:pPr>{properties}</w:pPr>'
+    if not properties and not runs:
+        return '<w:p/>'
+    return f'<w:p>{properties}{runs}</w:p>'
+
+
+def _code_run_list(code, props):
+    runs = [(LANGUAGE_PROPS, f"{code.language}\n")] if code.language else []
+    runs.append((props, code.text))
+    return runs
+
+
+def _code_runs(code, props):
+    return ''.join(_run(run_props, text) for run_props, text in _code_run_list(code, props))
+
+
+def _runs(runs):
+    return ''.join(_run(RUN_PROPS[run.kind], run.text) for run in runs)
+
+
+def _run(props, text):
+    content = _run_properties(props) + _run_content(text)
+    return f'<w:r>{content}</w:r>' if content else '<w:r/>'
+
+
+@lru_cache(maxsize=None)
+def _run_properties(props):
+    """<w:rPr>，子元素按架构顺序排列"""
+    parts = []
+    if props.style:
+        parts.append(f'<w:rStyle w:val="{props.style}"/>')
+    if props.fonts:
+        parts.append(f'<w:rFonts w:ascii="{props.fonts}" w:hAnsi="{props.fonts}"/>')
+    if props.color:
+        parts.append(f'<w:color w:val="{props.color}"/>')
+    if props.size is not None:
+        parts.append(f'<w:sz w:val="{props.size}"/>')
+    return f'<w:rPr>{"".join(parts)}</w:rPr>' if parts else ''
+
+
+def _run_content(text):
+    if INVALID_XML_RE.search(text):
+        raise ValueError(INVALID_XML_MESSAGE)
+    if '\t' not in text and '\n' not in text and '\r' not in text:
+        return _text(text) if text else ''
+    parts = []
+    for piece in RUN_BREAK_RE.split(text):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece == '\n' or piece == '\r':
+            parts.append('<w:br/>')
+        elif piece:
+            parts.append(_text(piece))
+    return ''.join(parts)
+
+
+def _text(text):
+    escaped = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    # 首尾有空白时需要保留空格
+    if len(text.strip()) < len(text):
+        return f'<w:t xml:space="preserve">{escaped}</w:t>'
+    return f'<w:t>{escaped}</w:t>'
+
+
+NODE_WRITERS = {
+    Blank: _BodyWriter.blank,
+    Rule: _BodyWriter.rule,
+    Heading: _BodyWriter.heading,
+    Paragraph: _BodyWriter.paragraph,
+    ListItem: _BodyWriter.list_item,
+    Code: _BodyWriter.code,
+    Quote: _BodyWriter.quote,
+    Table: _BodyWriter.table,
+}
@@ -0,0 +1,46 @@
+from collections import namedtuple
+
+# 表格转换可选值（与界面下拉列表一致）
+TABLE_CONVERSIONS = ("无", "空格", "/t", ",")
+
+# 处理选项：字段与 MarkdownTool 的属性一一对应，不可变且可哈希，可直接作为缓存键
+Options = namedtuple('Options', [
+    'remove_italic',
+    'remove_strikethrough',
+    'remove_highlight',
+    'remove_links',
+    'remove_unordered_list',
+    'remove_ordered_list',
+    'table_clean',
+    'table_conversion',
+    'table_to_word',
+], defaults=(False, False, False, False, False, False, False, "无", True))
+
+
+def options_from(source):
+    """从任意带同名属性的对象（如MarkdownTool）生成选项快照"""
+    return Options(*(getattr(source, name) for name in Options._fields))
+
+
+def describe_options(options):
+    """生成处理选项的摘要文本，用于导出完成后的提示"""
+    options_summary = []
+    if options.remove_italic:
+        options_summary.append("去除斜体")
+    if options.remove_strikethrough:
+        options_summary.append("去除删除线")
+    if options.remove_highlight:
+        options_summary.append("去除高亮")
+    if options.remove_links:
+        options_summary.append("去除链接")
+    if options.remove_unordered_list:
+        options_summary.append("清洗无序列表")
+    if options.remove_ordered_list:
+        options_summary.append("清洗有序列表")
+    if options.table_clean:
+        options_summary.append("表格清洁")
+    elif options.table_conversion != "无":
+        options_summary.append(f"表格转换: {options.table_conversion}")
+    if options.table_to_word and not options.table_clean and options.table_conversion == "无":
+        options_summary.append("表格转为Word表格")
+    return "，".join(options_summary) if options_summary else "保留所有格式"
@@ -0,0 +1,188 @@
+"""后台处理调度：防抖、丢弃过期任务，结果交回调用方线程；后台导出Word文档"""
+import threading
+import time
+
+
+class ProcessingScheduler:
+    """在工作线程上执行清洗任务
+
+    submit() 只保存一份不可变快照（文本与选项），工作线程等待 delay 秒内没有
+    新的提交后才开始处理；处理期间若有更新的提交，旧结果直接丢弃。
+    结果通过 post 投递回界面线程，Kivy 下传入 Clock.schedule_once 即可。
+    prepare(文本, 选项, cancelled) 在结果投递之后于另一个后台线程上执行，用于预先
+    准备后续操作（如解析导出用的文档树），不占用清洗线程；有新的提交后 cancelled()
+    返回 True，prepare 应尽快放弃（抛出任意异常即可），不拖慢下一次清洗。
+    """
+
+    def __init__(self, work, on_result, on_error=None, delay=0.15, post=None, prepare=None):
+        self.work = work
+        self.prepare = prepare
+        self.on_result = on_result
+        self.on_error = on_error
+        self.delay = delay
+        self.post = post or (lambda callback: callback(0))
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending = None
+        self._stopped = False
+        self._thread = None
+        self._prepare_condition = threading.Condition()
+        self._prepare_pending = None
+        self._prepare_thread = None
+
+    def submit(self, text, options):
+        """提交最新的快照，之前尚未完成的任务全部作废"""
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, text, options)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mdword-processing', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return self._generation
+
+    def cancel(self):
+        """作废所有排队中和执行中的任务"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify()
+        with self._prepare_condition:
+            self._prepare_pending = None
+            self._prepare_condition.notify()
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def _next_job(self):
+        """取出下一个任务；delay 秒内又有新提交则重新计时（防抖）"""
+        with self._condition:
+            while not self._stopped:
+                if self._pending is None:
+                    self._condition.wait()
+                    continue
+                job = self._pending
+                deadline = time.monotonic() + self.delay
+                while self._pending is job and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._pending = None
+                        return job
+                    self._condition.wait(remaining)
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            generation, text, options = job
+            try:
+                result = self.work(text, options)
+            except Exception as e:
+                if self.on_error is not None:
+                    self._deliver(generation, self.on_error, e)
+                continue
+            self._deliver(generation, self.on_result, result)
+            if self.prepare is not None and self.is_current(generation):
+                self._start_prepare(job)
+
+    def _start_prepare(self, job):
+        """交给准备线程；上一次尚未开始的准备直接被替换"""
+        with self._prepare_condition:
+            self._prepare_pending = job
+            if self._prepare_thread is None:
+                self._prepare_thread = threading.Thread(target=self._run_prepare, name='mdword-prepare',
+                                                        daemon=True)
+                self._prepare_thread.start()
+            self._prepare_condition.notify()
+
+    def _run_prepare(self):
+        while True:
+            with self._prepare_condition:
+                while self._prepare_pending is None and not self._stopped:
+                    self._prepare_condition.wait()
+                if self._stopped:
+                    return
+                generation, text, options = self._prepare_pending
+                self._prepare_pending = None
+            if not self.is_current(generation):
+                continue
+            try:
+                self.prepare(text, options, lambda: not self.is_current(generation))
+            except Exception:
+                # 只是预先准备，被放弃或出错时留给真正执行的操作处理
+                pass
+
+    def _deliver(self, generation, callback, value):
+        if not self.is_current(generation):
+            return
+
+        def deliver(dt):
+            # 投递到界面线程期间可能又有新的提交，再检查一次
+            if self.is_current(generation):
+                callback(value)
+        self.post(deliver)
+
+
+# 进度投递到界面线程的最小间隔（秒）
+PROGRESS_INTERVAL = 0.1
+
+
+class ExportCancelled(Exception):
+    """导出被取消"""
+
+
+class ExportTask:
+    """在工作线程上导出一份快照（文本与选项），界面线程不被阻塞
+
+    export(文本, 选项, 路径, progress=...) 负责实际导出，可直接传入 mdword.to_docx；它定期
+    调用 progress(已完成, 总数)，进度按 PROGRESS_INTERVAL 节流后经 post 投递给
+    on_progress。cancel() 之后下一次报告进度时抛出 ExportCancelled 中止导出，
+    on_error 收到该异常。完成时 on_done 收到路径。
+    """
+
+    def __init__(self, export, on_done, on_error, on_progress=None, post=None):
+        self.export = export
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.post = post or (lambda callback: callback(0))
+        self._cancelled = threading.Event()
+        self._last_progress = 0
+        self._thread = None
+
+    def start(self, text, options, path):
+        self._thread = threading.Thread(target=self._run, args=(text, options, path),
+                                        name='mdword-export', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _progress(self, done, total):
+        if self._cancelled.is_set():
+            raise ExportCancelled()
+        now = time.monotonic()
+        if self.on_progress is not None and (done == total or now - self._last_progress >= PROGRESS_INTERVAL):
+            self._last_progress = now
+            self.post(lambda dt: self.on_progress(done, total))
+
+    def _run(self, text, options, path):
+        try:
+            if self._cancelled.is_set():
+                raise ExportCancelled()
+            self.export(text, options, path, progress=self._progress)
+        except Exception as e:
+            self.post(lambda dt, e=e: self.on_error(e))
+        else:
+            self.post(lambda dt: self.on_done(path))
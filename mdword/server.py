@@ -0,0 +1,220 @@
+"""本地HTTP转换服务：python -m mdword --serve [--host 地址] [--port 端口] [-j 进程数]
+
+    POST /clean   请求体为Markdown文本（UTF-8），返回清洗后的纯文本
+    POST /docx    请求体同上，返回Word文档（.docx）
+    GET  /health  返回JSON：状态、工作进程数、正在处理和排队的请求数；
+                  进程池不可用时状态为 broken（附 error），返回码为 503
+
+处理选项用查询参数给出，名称与 Options 的字段（即 MarkdownTool 的属性）相同，
+如 /clean?remove_links=1&table_conversion=,；未给出的选项使用启动时命令行中的设置。
+
+请求由预先启动并预热（已导入 python-docx、建好模板）的进程池处理；正在处理和
+排队的请求总数超过上限时直接返回 503，请求体超过大小上限时返回 413。
+"""
+import json
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from urllib.parse import parse_qs, urlsplit
+
+from . import warm_up
+from .options import Options, TABLE_CONVERSIONS
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 请求体大小上限（字节）
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# 除正在处理的请求外最多排队的请求数
+DEFAULT_MAX_QUEUE = 64
+
+# 读取请求的超时（秒），避免慢客户端一直占用线程
+REQUEST_TIMEOUT = 60
+
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# 查询参数中开关选项的取值
+BOOLEAN_VALUES = {'1': True, 'true': True, 'yes': True, 'on': True,
+                  '0': False, 'false': False, 'no': False, 'off': False}
+
+
+def _clean(text, options):
+    from . import clean
+    return clean(text, options).encode('utf-8')
+
+
+def _docx(text, options):
+    from . import to_docx_bytes
+    return to_docx_bytes(text, options)
+
+
+# 转换端点：路径 -> (在工作进程中执行的函数, 响应类型)
+CONVERSIONS = {
+    '/clean': (_clean, 'text/plain; charset=utf-8'),
+    '/docx': (_docx, DOCX_MIME_TYPE),
+}
+
+
+def options_from_query(query, defaults=Options()):
+    """由查询参数生成选项，未给出的使用 defaults；未知参数或取值无效时抛出 ValueError"""
+    values = parse_qs(query, keep_blank_values=True)
+    unknown = sorted(set(values) - set(Options._fields))
+    if unknown:
+        raise ValueError(f"未知选项: {', '.join(unknown)}")
+    fields = {}
+    for name, items in values.items():
+        value = items[-1]
+        if name == 'table_conversion':
+            if value not in TABLE_CONVERSIONS:
+                raise ValueError(f"table_conversion 只能是 {', '.join(TABLE_CONVERSIONS)} 之一")
+            fields[name] = value
+        elif value.lower() in BOOLEAN_VALUES:
+            fields[name] = BOOLEAN_VALUES[value.lower()]
+        else:
+            raise ValueError(f"{name} 的取值无效: {value}")
+    return defaults._replace(**fields)
+
+
+class ConversionService:
+    """预热的进程池，加上正在处理与排队请求数的上限"""
+
+    def __init__(self, workers, max_queue=DEFAULT_MAX_QUEUE):
+        self.workers = workers
+        self.limit = workers + max_queue
+        self._lock = Lock()
+        self._pending = 0
+        self._error = None  # 进程池不可用时的原因
+        # 工作进程启动时先执行 warm_up，之后的请求不再有导入和建模板的首次开销
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+        # 同时提交与进程数相同的任务，让进程池一次启动全部工作进程（各自执行 initializer）
+        done, _ = wait([self._executor.submit(len, '') for _ in range(workers)])
+        for future in done:
+            if isinstance(future.exception(), BrokenExecutor):
+                self._error = str(future.exception())
+
+    def admit(self):
+        """登记一个请求；正在处理与排队的请求已达上限时返回 False，之后必须调用 release()"""
+        with self._lock:
+            if self._pending >= self.limit:
+                return False
+            self._pending += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def convert(self, function, text, options):
+        """在工作进程中转换，进程都在忙时排队等待"""
+        try:
+            return self._executor.submit(function, text, options).result()
+        except BrokenExecutor as e:
+            # 工作进程异常退出后进程池不再可用，由 /health 报告
+            self._error = str(e)
+            raise
+
+    @property
+    def usable(self):
+        return self._error is None
+
+    def status(self):
+        with self._lock:
+            pending = self._pending
+        active = min(pending, self.workers)
+        status = {'status': 'ok' if self.usable else 'broken', 'workers': self.workers,
+                  'active': active, 'queued': pending - active}
+        if not self.usable:
+            status['error'] = self._error
+        return status
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    server_version = 'mdword'
+    timeout = REQUEST_TIMEOUT
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            self._reply(404, '不存在的路径')
+            return
+        service = self.server.service
+        # 进程池不可用时返回 503，便于外部健康检查发现并重启服务
+        self._reply(200 if service.usable else 503, json.dumps(service.status()), 'application/json')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in CONVERSIONS:
+            self._reply(404, '不存在的路径')
+            return
+        function, content_type = CONVERSIONS[url.path]
+        length = self.headers.get('Content-Length', '')
+        if not length.isdigit():
+            self.close_connection = True
+            self._reply(411, '需要 Content-Length')
+            return
+        # 以下拒绝请求时都不读取请求体，直接关闭连接
+        if int(length) > self.server.max_bytes:
+            self.close_connection = True
+            self._reply(413, f'请求体超过上限 {self.server.max_bytes} 字节')
+            return
+        service = self.server.service
+        if not service.admit():
+            self.close_connection = True
+            self._reply(503, '服务繁忙，请稍后重试')
+            return
+        try:
+            body = self.rfile.read(int(length))
+            try:
+                options = options_from_query(url.query, self.server.defaults)
+                text = body.decode('utf-8-sig')
+            except ValueError as e:
+                self._reply(400, f"请求无效: {str(e)}")
+                return
+            try:
+                result = service.convert(function, text, options)
+            except Exception as e:
+                self._reply(500, f"转换失败: {str(e)}")
+                return
+        finally:
+            service.release()
+        self._reply(200, result, content_type)
+
+    def _reply(self, code, body, content_type='text/plain; charset=utf-8'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, defaults=Options(), max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(address, ConversionHandler)
+        self.service = service
+        self.defaults = defaults
+        self.max_bytes = max_bytes
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=1, defaults=Options(),
+          max_bytes=DEFAULT_MAX_BYTES, max_queue=DEFAULT_MAX_QUEUE):
+    """启动进程池和HTTP服务，直到 Ctrl+C"""
+    service = ConversionService(workers, max_queue)
+    server = ConversionServer((host, port), service, defaults, max_bytes)
+    print(f"mdword 转换服务已启动: http://{host}:{server.server_port}/（{workers} 个工作进程）", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
@@ -0,0 +1,72 @@
+"""启动耗时分析：各模块的导入耗时和启动各阶段的时间
+
+    profile = StartupProfile(started)   # started 为程序开始执行时的 time.perf_counter()
+    ...                                  # 导入模块、建立窗口
+    profile.mark('第一帧')
+    print(profile.report())
+
+StartupProfile 替换 builtins.__import__，只在创建它的线程上计时；嵌套的导入
+计入最外层 import 语句所属的顶层包（如导入 kivy.core.window 时加载窗口后端的
+耗时计入 kivy）。StartupProfile 之前已导入的 mdword 包本身单独列为一项。
+"""
+import builtins
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# 报告中列出的模块数
+REPORT_MODULES = 15
+
+
+class StartupProfile:
+    def __init__(self, started):
+        self.started = started
+        self.imports = defaultdict(float)   # 顶层包 -> 导入耗时（秒）
+        self.marks = []                     # (阶段, 距开始的秒数)
+        self._depth = 0
+        self._thread = threading.get_ident()
+        self._import = builtins.__import__
+        # 导入本模块时 mdword 包已加载，这部分耗时从开始执行算起
+        self.imports['mdword'] = time.perf_counter() - started
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if self._depth or threading.get_ident() != self._thread:
+            return self._import(name, globals, locals, fromlist, level)
+        module = name
+        if level:
+            # 相对导入换算为完整的模块名
+            package = (globals or {}).get('__package__') or ''
+            module = f"{package}.{name}" if name else package
+        top = module.partition('.')[0]
+        if module in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            self.imports[top] += time.perf_counter() - start
+            self._depth -= 1
+
+    def mark(self, stage):
+        """记录一个启动阶段的完成时间"""
+        self.marks.append((stage, time.perf_counter() - self.started))
+
+    def stop(self):
+        """恢复原来的 __import__，之后的导入不再计时"""
+        builtins.__import__ = self._import
+
+    def report(self):
+        lines = ['启动耗时分析（自程序开始执行起，单位 ms）', '', '模块导入：']
+        ranked = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in ranked[:REPORT_MODULES]:
+            lines.append(f"  {name:<24}{seconds * 1000:>10.1f}")
+        rest = ranked[REPORT_MODULES:]
+        if rest:
+            lines.append(f"  {f'其余 {len(rest)} 个':<24}{sum(s for _, s in rest) * 1000:>10.1f}")
+        lines.append(f"  {'合计':<24}{sum(self.imports.values()) * 1000:>10.1f}")
+        lines += ['', '启动阶段：']
+        lines += [f"  {stage:<24}{seconds * 1000:>10.1f}" for stage, seconds in self.marks]
+        return '\n'.join(lines)
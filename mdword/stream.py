@@ -0,0 +1,226 @@
+"""流式清洗：按块读取、清洗并输出，内存占用与单个块的大小相当，与文件大小无关
+
+切块规则与 mdword.blocks 相同：只在没有任何规则能够跨越的位置切分，表格清洁的
+"表格中"状态不会延续到切分点之后。块末尾有未闭合的 md`` 或链接时，该块暂存，
+与后面的块合并到能够闭合为止再一起清洗，暂存的文本有上限（MAX_PENDING_CHUNKS 个
+块大小），超过时按未闭合处理。代码块标记不影响清洗规则，无需单独记录。
+除跨越超过该上限的 md`` 或链接外，输出拼接后与 clean(整篇文本) 逐字节一致。
+"""
+import codecs
+import io
+import mmap
+import os
+from functools import partial
+
+from . import timing
+from .blocks import BOUNDARY_RE, is_anchor_line
+from .cleaner import clean_block, link_closes, md_span_closes, md_span_open
+from .options import Options
+
+# 每次从文件读取的字符数，也是切出的块的大致大小
+CHUNK_SIZE = 1 << 20
+
+# 末尾有未闭合标记的块最多暂存多少个块大小的文本：超过时当作直到结束都没有闭合，
+# 暂存的块逐块输出，内存占用不随文件大小增长（跨越这么长的 md`` 或链接极少见，
+# 只有这种情况下结果与 clean(整篇文本) 不同）
+MAX_PENDING_CHUNKS = 4
+
+# 写出结果时的缓冲区大小（字节）
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def last_boundary(text, start, end, options):
+    """text[start:end]（start 为行首，end 为换行符）中最后一个切分点之后的位置，没有则返回 0
+
+    候选位置由正则一次找出，只从后往前检查到第一个可用的为止。
+    """
+    for match in reversed(list(BOUNDARY_RE.finditer(text, start, end))):
+        if is_anchor_line(match.group(1), options):
+            return match.end()
+    return 0
+
+
+def iter_blocks(source, options=Options(), chunk_size=CHUNK_SIZE):
+    """从文件对象中读取文本，在切分点处切出大约 chunk_size 大小的块（块之间以单个换行符相连）"""
+    buffer = ''
+    scanned = 0  # buffer 中从该位置（行首）开始尚未确定是否有切分点
+    for chunk in iter(partial(source.read, chunk_size), ''):
+        buffer += chunk
+        # 只查找完整的行；最后一个完整行之后的空白行还没读到，留到下次判断
+        end = buffer.rfind('\n', scanned)
+        if end < 0:
+            continue
+        cut = last_boundary(buffer, scanned, end, options)
+        scanned = buffer.rfind('\n', 0, end) + 1
+        if cut:
+            yield buffer[:cut - 1]
+            buffer = buffer[cut:]
+            scanned -= cut
+    yield buffer
+
+
+def link_state(cleaned, options):
+    """清洗结果末尾是否有未闭合的 [（等待其后的 ]）和 ](（等待其后的 )）"""
+    if not options.remove_links:
+        return False, False
+    return cleaned.rfind('[') > cleaned.rfind(']'), cleaned.rfind('](') > cleaned.rfind(')')
+
+
+def opens_link(block, options):
+    """该块单独清洗后末尾未闭合的 [ 和 ]("""
+    if not (options.remove_links and ('[' in block or '](' in block)):
+        return False, False
+    return link_state(clean_block(block, options), options)
+
+
+def iter_clean(source, options=Options(), chunk_size=CHUNK_SIZE):
+    """逐块清洗文件对象中的Markdown文本，依次产出清洗后的文本片段
+
+    ''.join(iter_clean(f, options)) == clean(f.read(), options)
+
+    唯一的例外是跨越超过 MAX_PENDING_CHUNKS * chunk_size 个字符的 md`` 或链接（见 _clean_blocks）。
+    """
+    blocks = iter_blocks(source, options, chunk_size)
+    return strip_joined(_clean_blocks(blocks, options, MAX_PENDING_CHUNKS * chunk_size))
+
+
+def _clean_blocks(blocks, options, max_pending):
+    """逐块清洗，末尾有未闭合标记的块与后面的块合并后再清洗
+
+    暂存期间只检查新来的块能否闭合暂存的标记，能闭合时才把暂存的块合并、重新清洗
+    一次。未闭合的 [ 遇到其后第一个 ] 不紧跟 ( 时已不可能闭合，此时若没有其它
+    未闭合的标记，暂存的块立即逐块输出；一直到结束都没有闭合时同样逐块输出，
+    与单独清洗的结果相同。暂存的文本超过 max_pending 个字符时不再等待，
+    按直到结束都没有闭合处理。
+    """
+    pending = []         # 末尾有未闭合标记的块，及其后不能闭合该标记的块
+    pending_size = 0     # pending 中的字符数
+    head = None          # pending[0] 的清洗结果
+    md_open = bracket_open = paren_open = False
+    for block in blocks:
+        if pending:
+            closes = None
+            if (md_open and md_span_closes(block)) or (paren_open and ')' in block):
+                closes = True
+            elif bracket_open:
+                closes = link_closes(block, options)
+            if closes:
+                pending.append(block)
+                block = '\n'.join(pending)
+            elif (closes is False and not (md_open or paren_open)) or pending_size >= max_pending:
+                # 暂存的 [ 都已不能闭合，或暂存的文本已达上限：暂存的块逐块输出，该块照常处理
+                yield head
+                for pending_block in pending[1:]:
+                    yield clean_block(pending_block, options)
+                pending = []
+            else:
+                pending.append(block)
+                pending_size += len(block)
+                # 块中新出现的未闭合标记同样要等到闭合，或到结束为止
+                bracket, paren = opens_link(block, options)
+                md_open = md_open or md_span_open(block)
+                bracket_open = bracket or (bracket_open and closes is None)
+                paren_open = paren_open or paren
+                continue
+        cleaned = clean_block(block, options)
+        md_open = md_span_open(block)
+        bracket_open, paren_open = link_state(cleaned, options)
+        if md_open or bracket_open or paren_open:
+            pending = [block]
+            pending_size = len(block)
+            head = cleaned
+            continue
+        pending = []
+        yield cleaned
+    if pending:
+        yield head
+        for block in pending[1:]:
+            yield clean_block(block, options)
+
+
+def strip_joined(pieces):
+    """逐段产出 '\\n'.join(pieces).strip()，末尾的空白等到后面还有内容时才输出"""
+    separator = ''
+    started = False  # 是否已输出过非空白内容（开头的空白要去掉）
+    held = ''        # 暂不输出的空白
+    for piece in pieces:
+        piece = separator + piece
+        separator = '\n'
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        body = piece.rstrip()
+        if body:
+            yield held + body
+            held = piece[len(body):]
+        else:
+            held += piece
+
+
+class MappedText:
+    """把内存映射的文件包装成只读文本流，read(n) 每次只解码 n 个字节
+
+    切片直接引用映射的内存，不复制；被切开的多字节字符由增量解码器留到下一段，
+    换行符与文本模式的 open() 一样统一为 \\n，开头的 BOM 会被去掉。
+    """
+
+    def __init__(self, mapped, encoding='utf-8-sig'):
+        self._view = memoryview(mapped)
+        self._pos = 0
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+
+    def read(self, size=-1):
+        total = len(self._view)
+        while True:
+            end = total if size < 0 else min(total, self._pos + size)
+            final = end == total
+            # 切片用完立即释放，解码出错时映射也能正常关闭
+            with self._view[self._pos:end] as data:
+                text = self._decoder.decode(data, final)
+            self._pos = end
+            # 只读到半个字符时解码结果为空，继续往后读，避免被当作文件结束
+            if text or final:
+                return text
+
+    def close(self):
+        # 映射关闭前必须释放对它的引用
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@timing.logged
+def clean_file(source, target, options=Options(), chunk_size=CHUNK_SIZE):
+    """清洗文本文件并写入 target：输入做内存映射后逐段解码清洗，结果经缓冲区写出
+
+    内存占用与文件大小无关，可处理比内存还大的文件；结果与 clean(整篇文本) 相同
+    （跨越超过 MAX_PENDING_CHUNKS 个块大小的 md`` 或链接除外，见 iter_clean）。
+    先写临时文件，完成后才改名为 target，中途中断不会留下只写了一半的 target。
+    """
+    temp_path = os.fspath(target) + '.tmp'
+    try:
+        _clean_file(source, temp_path, options, chunk_size)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _clean_file(source, target, options, chunk_size):
+    with open(source, 'rb') as src, \
+            open(target, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as dst:
+        # 空文件无法映射
+        if not os.fstat(src.fileno()).st_size:
+            return
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped, MappedText(mapped) as text:
+            # 顺序读取，提示系统预读并尽早回收读过的页（Windows 没有 madvise）
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            dst.writelines(iter_clean(text, options, chunk_size))
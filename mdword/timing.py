@@ -0,0 +1,107 @@
+"""清洗规则的分段计时
+
+    with timing.record() as timings:
+        clean(text, options)
+    for span in timings.summary():
+        print(span.stage, span.seconds, span.matches)
+
+只在 record() 范围内（按线程）记录，未启用时每次清洗只多一次线程局部变量查询。
+计时期间行内规则按原顺序逐条执行，以便分别计时；结果与合并扫描完全相同。
+设置环境变量 MDWORD_TIMING=1 后，clean、IncrementalCleaner.clean 和 clean_file
+每次调用都通过 logging（名为 mdword）输出一行各规则的耗时；调用方自己没有配置
+logging 时（如界面），用 log_to_stderr() 把这些日志直接输出到标准错误。
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger('mdword')
+
+# 是否为每次清洗输出一行耗时日志（启动时读取环境变量）
+LOG_ENABLED = os.environ.get('MDWORD_TIMING', '') not in ('', '0')
+
+# 一个规则阶段的记录：耗时（秒）、匹配次数、输入与输出的UTF-8字节数
+Span = namedtuple('Span', ['stage', 'seconds', 'matches', 'bytes_in', 'bytes_out'])
+
+_local = threading.local()
+
+
+class Timings:
+    """一次记录期间各规则阶段的计时结果"""
+
+    def __init__(self):
+        self.spans = []
+
+    def measure(self, stage, func, text):
+        """执行 func(text) -> (结果, 匹配次数) 并记录，返回结果"""
+        start = time.perf_counter()
+        result, matches = func(text)
+        elapsed = time.perf_counter() - start
+        self.spans.append(Span(stage, elapsed, matches,
+                               len(text.encode('utf-8', 'surrogatepass')),
+                               len(result.encode('utf-8', 'surrogatepass'))))
+        return result
+
+    def summary(self):
+        """按阶段汇总（分块清洗时同一阶段会执行多次），按首次出现的顺序返回 Span 列表"""
+        totals = OrderedDict()
+        for span in self.spans:
+            total = totals.get(span.stage)
+            totals[span.stage] = span if total is None else Span(
+                span.stage, total.seconds + span.seconds, total.matches + span.matches,
+                total.bytes_in + span.bytes_in, total.bytes_out + span.bytes_out)
+        return list(totals.values())
+
+    def total(self):
+        return sum(span.seconds for span in self.spans)
+
+    def log_line(self):
+        stages = '，'.join(f"{span.stage} {span.seconds * 1000:.2f} ms/{span.matches} 处"
+                          for span in self.summary())
+        return f"清洗耗时 {self.total() * 1000:.2f} ms（{stages or '无'}）"
+
+
+def current():
+    """当前线程正在记录的 Timings，未启用时为 None"""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def record(log=False):
+    """在当前线程记录范围内所有清洗的分段耗时；嵌套时并入外层的记录"""
+    outer = current()
+    if outer is not None:
+        yield outer
+        return
+    timings = _local.timings = Timings()
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+        if log:
+            logger.info(timings.log_line())
+
+
+def log_to_stderr():
+    """给 mdword 日志单独加一个输出到标准错误的处理器，不依赖（也不经过）根日志的配置"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def logged(func):
+    """MDWORD_TIMING 启用时，每次调用 func 都记录并输出一行耗时日志；否则原样返回 func"""
+    if not LOG_ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with record(log=True):
+            return func(*args, **kwargs)
+    return wrapper
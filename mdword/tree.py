@@ -0,0 +1,464 @@
+"""文档树：把Markdown解析为块级节点（标题、段落、列表项、表格、引用、代码块、分割线）
+
+每个节点中的文本已按行内格式切分为 Run（格式类型, 文本），Word导出只需遍历节点
+生成对应的段落和表格，不再自己逐行解析。块级解析规则与原导出逐行处理的结果完全一致
+（包括代码块中的空行、未闭合的代码块等细节），行内格式由 inline_runs 单遍扫描切分。
+只依赖标准库，不加载 python-docx。
+
+DocumentParser 缓存上一次的文档树和逐行的行内格式结果：界面在预览清洗之后
+顺便解析，紧接着导出时直接复用，编辑后也只需重新处理变化的行。
+"""
+import heapq
+import re
+import threading
+from collections import namedtuple
+from itertools import groupby
+
+from .options import Options
+
+# 行内格式片段，kind 取值：
+#   normal    - 普通文本（宋体）
+#   bold      - 加粗（黑体），包括 **加粗**、md`` 和键值对的键名
+#   quote     - 双引号文本（蓝色）
+#   code      - 行内代码（等宽字体、灰色底纹）
+#   symbol    - 引用块中无序列表的项目符号
+#   plain     - 不设置格式（引用块中的换行、有序列表编号）
+Run = namedtuple('Run', ['kind', 'text'])
+
+# 导出格式相同的片段类型：plain 与 normal 都不设置任何格式
+RUN_FORMATS = {'plain': 'normal'}
+
+Blank = namedtuple('Blank', [])                        # 空行
+Rule = namedtuple('Rule', [])                          # 分割线
+Heading = namedtuple('Heading', ['level', 'text'])     # 标题（文本已去掉加粗和双引号标记）
+Paragraph = namedtuple('Paragraph', ['runs'])          # 普通段落
+ListItem = namedtuple('ListItem', ['ordered', 'runs'])  # 列表项
+Code = namedtuple('Code', ['language', 'text'])        # 代码块
+Quote = namedtuple('Quote', ['items'])                 # 引用块，items 为 Paragraph、Heading 或 Code
+Table = namedtuple('Table', ['rows', 'has_header'])    # 表格，rows 为 Cell 的二维元组
+Cell = namedtuple('Cell', ['kind', 'content'])         # 单元格，kind 为 text、quote（content 为 Run 元组）或 code（content 为 Code）
+
+# 引用块中各项之间的换行
+LINE_BREAK = Run('plain', '\n')
+
+RULE_RE = re.compile(r'^[-*_]{3,}$')
+HEADING_RE = re.compile(r'^(#+)\s+(.*)')
+UNORDERED_LIST_RE = re.compile(r'^\s*([-*+])\s+(.*)')
+ORDERED_LIST_RE = re.compile(r'^\s*(\d+\.)\s+(.*)')
+KEY_VALUE_RE = re.compile(r'^([^:]+):\s*(.*)')
+TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?[\s\-:|]+\|?\s*$')
+
+BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+DOUBLE_QUOTE_RE = re.compile(r'"([^"]*)"')
+
+# 行内标记可能开始的位置，其余字符不必逐个查看
+INLINE_MARK_RE = re.compile(r'md``|[*`"~=_\[]')
+
+# 表格转换选项对应的单元格连接符（未转为Word表格时）
+CELL_SEPARATORS = {"空格": "    ", "/t": "\t", ",": ","}
+
+
+def parse(text, options=Options(), runs=None):
+    """把Markdown文本解析为节点元组；runs(文本) 返回行内格式片段，默认直接计算"""
+    if runs is None:
+        runs = lambda line: inline_runs(line, options)
+    group_tables = options.table_to_word and not options.table_clean and options.table_conversion == "无"
+    lines = text.splitlines()
+    nodes = []
+
+    i = 0
+    in_code_block = False
+    code_block_content = []
+    language = ""
+
+    while i < len(lines):
+        line = lines[i].strip()
+        i += 1
+
+        # 空行（代码块中的空行同样输出为空段落）
+        if not line:
+            nodes.append(Blank())
+            continue
+
+        # 代码块开始和结束标记 ```；未闭合的代码块不输出
+        if line.startswith("```"):
+            if not in_code_block:
+                in_code_block = True
+                code_block_content = []
+                language = line[3:].strip() if len(line) > 3 else ""
+            else:
+                in_code_block = False
+                nodes.append(Code(language, "\n".join(code_block_content)))
+            continue
+
+        if in_code_block:
+            code_block_content.append(line)
+            continue
+
+        # 分隔线（如 ---、***、___ 独占一行）
+        if RULE_RE.match(line):
+            nodes.append(Rule())
+            continue
+
+        heading_match = HEADING_RE.match(line)
+        if heading_match:
+            nodes.append(Heading(len(heading_match.group(1)), _heading_text(heading_match.group(2))))
+            continue
+
+        # 列表：设置了移除列表时作为普通段落
+        list_match = UNORDERED_LIST_RE.match(line)
+        if list_match:
+            item_runs = runs(list_match.group(2))
+            nodes.append(Paragraph(item_runs) if options.remove_unordered_list else ListItem(False, item_runs))
+            continue
+        ordered_list_match = ORDERED_LIST_RE.match(line)
+        if ordered_list_match:
+            item_runs = runs(ordered_list_match.group(2))
+            nodes.append(Paragraph(item_runs) if options.remove_ordered_list else ListItem(True, item_runs))
+            continue
+
+        # 键值对（例如"软件工具: Flask 2.3.2"）：键名加粗
+        key_value_match = KEY_VALUE_RE.match(line)
+        if key_value_match and not line.startswith('>'):
+            key = DOUBLE_QUOTE_RE.sub(r'\1', key_value_match.group(1).strip())
+            value = key_value_match.group(2).strip()
+            nodes.append(Paragraph(merge_runs((Run('bold', f"{key}: "),) + runs(value))))
+            continue
+
+        if line.startswith('>'):
+            i = _parse_quote(lines, i - 1, nodes, runs)
+            continue
+
+        if '|' in line:
+            if group_tables:
+                i = _parse_table(lines, i - 1, nodes, runs)
+                continue
+            # 未转为Word表格时：跳过分隔行，单元格按表格转换选项连接为一行
+            if TABLE_SEPARATOR_RE.match(line):
+                continue
+            cells = [cell.strip() for cell in line.strip('|').split('|')]
+            separator = " " if options.table_clean else CELL_SEPARATORS.get(options.table_conversion, " ")
+            nodes.append(Paragraph(runs(separator.join(cells))))
+            continue
+
+        nodes.append(Paragraph(runs(line)))
+
+    return tuple(nodes)
+
+
+def _heading_text(text):
+    """标题文本去掉加粗标记和双引号"""
+    return DOUBLE_QUOTE_RE.sub(r'\1', BOLD_RE.sub(r'\1', text))
+
+
+def _parse_table(lines, start_index, nodes, runs):
+    """提取从 start_index 开始的连续表格行（遇到空行或不含 | 的行结束），返回下一行的位置"""
+    rows = []
+    has_header_separator = False
+    i = start_index
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line or '|' not in line:
+            break
+        i += 1
+        if TABLE_SEPARATOR_RE.match(line):
+            has_header_separator = True
+            continue
+        rows.append(tuple(_parse_cell(cell.strip(), runs) for cell in line.strip('|').split('|')))
+    if rows:
+        nodes.append(Table(tuple(rows), has_header_separator))
+    return i
+
+
+def _parse_cell(content, runs):
+    if content.startswith('>'):
+        return Cell('quote', runs(content[1:].strip()))
+    if content.startswith('```') and content.endswith('```'):
+        # 单元格只有一行，代码内容为空，``` 之后的部分都作为语言标记
+        return Cell('code', Code(content[3:].strip(), ''))
+    return Cell('text', runs(content))
+
+
+def _parse_quote(lines, start_index, nodes, runs):
+    """提取从 start_index 开始的连续引用行并解析其中的代码块、标题和列表，返回下一行的位置"""
+    quote_content = []
+    i = start_index
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line.startswith('>'):
+            break
+        quote_content.append(line[1:].strip())
+        i += 1
+
+    items = []
+    j = 0
+    while j < len(quote_content):
+        line = quote_content[j]
+        j += 1
+
+        # 引用中的代码块到单独一行的 ``` 为止，未闭合时一直到引用结束
+        if line.startswith("```"):
+            language = line[3:].strip()
+            code_content = []
+            while j < len(quote_content):
+                code_line = quote_content[j]
+                j += 1
+                if code_line == "```":
+                    break
+                code_content.append(code_line)
+            items.append(Code(language, "\n".join(code_content)))
+            continue
+
+        heading_match = HEADING_RE.match(line)
+        if heading_match:
+            items.append(Heading(len(heading_match.group(1)), _heading_text(heading_match.group(2))))
+            continue
+
+        # 引用中的列表项不处理行内格式
+        list_match = UNORDERED_LIST_RE.match(line)
+        if list_match:
+            items.append(Paragraph((Run('symbol', "• "), Run('normal', list_match.group(2)))))
+            continue
+        ordered_list_match = ORDERED_LIST_RE.match(line)
+        if ordered_list_match:
+            items.append(Paragraph((Run('plain', f"{ordered_list_match.group(1)} "),
+                                    Run('normal', ordered_list_match.group(2)))))
+            continue
+
+        items.append(Paragraph(runs(line)))
+
+    nodes.append(Quote(tuple(items)))
+    return i
+
+
+def inline_runs(text, options=Options()):
+    """把一行文本从左到右扫描一遍，切分为行内格式片段
+
+    加粗（**、md``）、双引号和行内代码生成对应格式的片段；斜体、删除线、高亮和链接
+    按选项去掉标记，标记之间的内容继续参与扫描。同一位置依次尝试 md``、**、*、`、"、
+    ~~、==、_、[，先开始的片段优先，与之重叠的标记当作普通文字。相邻的普通文字合并为
+    一个片段。
+    """
+    if not INLINE_MARK_RE.search(text):
+        return (Run('normal', text),)
+    return _InlineScanner(text, options).runs()
+
+
+class _InlineScanner:
+    """单遍行内扫描
+
+    查找结束标记时记住每种标记上一次找到的位置：开始标记的位置单调增加，上次的结果
+    只要不在本次起点之前就仍然有效，找不到则之后也不会再有，每种标记整行只需向前扫描
+    一遍，标记再多也是线性时间。
+    """
+
+    def __init__(self, text, options):
+        self.text = text
+        self.options = options
+        self._found = {}  # 标记 -> 上一次找到的位置（-1 表示之后再也没有）
+
+    def runs(self):
+        text = self.text
+        runs = []         # [格式, 文字片段列表]，相邻的同格式片段直接合并
+        normal = []       # 尚未输出的普通文字
+        drops = []        # 待去掉的结束标记 (起点, 终点)，按起点排列的堆
+        claimed = set()   # 已被某个开始标记认领的结束标记起点
+        pos = 0           # 尚未处理的文字起点
+        while True:
+            match = INLINE_MARK_RE.search(text, pos)
+            start = match.start() if match else len(text)
+            if drops and drops[0][0] <= start:
+                # 先到达斜体等的结束标记：去掉它；已被其他片段覆盖的直接丢弃
+                drop_start, drop_end = heapq.heappop(drops)
+                if drop_start >= pos:
+                    normal.append(text[pos:drop_start])
+                    pos = drop_end
+                continue
+            if match is None:
+                break
+            span = self._span(start)
+            if span is not None and span[0] is None and span[1][0] in claimed:
+                # 结束标记已属于前面的开始标记（如 [a[b](c) 中的第二个 [）
+                span = None
+            if span is None:
+                # 无法闭合的标记当作普通文字
+                normal.append(text[pos:start + 1])
+                pos = start + 1
+                continue
+            normal.append(text[pos:start])
+            kind, content, end = span
+            if kind is None:
+                # 只去掉标记的片段：跳过开始标记，记下结束标记，内容继续扫描
+                heapq.heappush(drops, content)
+                claimed.add(content[0])
+            else:
+                # 无论是否输出都要清空，否则空片段不断累积，any() 每次重扫整个列表
+                if any(normal):
+                    runs.append(('normal', normal))
+                normal = []
+                if runs and runs[-1][0] == kind:
+                    runs[-1][1].append(content)
+                else:
+                    runs.append((kind, [content]))
+            pos = end
+        normal.append(text[pos:])
+        if any(normal) or not runs:
+            runs.append(('normal', normal))
+        return tuple(Run(kind, ''.join(pieces)) for kind, pieces in runs)
+
+    def _span(self, start):
+        """start 处开始的片段：(格式, 内容, 终点)；只去掉标记时为 (None, (结束标记起点, 终点), 开始标记终点)"""
+        text = self.text
+        options = self.options
+        char = text[start]
+        if char == 'm':
+            close = self._find('``', start + 4)
+            if close >= 0:
+                return 'bold', _strip_pairs(text[start + 4:close], '**', '**'), close + 2
+            return None
+        if text.startswith('**', start):
+            close = self._find('**', start + 2)
+            if close >= 0:
+                return 'bold', _strip_pairs(text[start + 2:close], 'md``', '``'), close + 2
+            return None
+        if char == '`':
+            close = self._find('`', start + 1)
+            if close > start + 1:
+                return 'code', text[start + 1:close], close + 1
+            return None
+        if char == '"':
+            close = self._find('"', start + 1)
+            if close >= 0:
+                return 'quote', text[start:close + 1], close + 1
+            return None
+        if char in '*_':
+            # 单个 * 或 _，前后都不能紧挨着同一字符
+            if not options.remove_italic or text.startswith(char, start + 1) or (start and text[start - 1] == char):
+                return None
+            close = self._find(char, start + 1, single=True)
+            return (None, (close, close + 1), start + 1) if close >= 0 else None
+        if char in '~=':
+            marker = char * 2
+            if not text.startswith(marker, start):
+                return None
+            if char == '~' and options.remove_strikethrough:
+                close = self._find(marker, start + 2)
+            elif char == '=' and options.remove_highlight:
+                # 高亮的内容不能为空
+                close = self._find(marker, start + 3)
+            else:
+                return None
+            return (None, (close, close + 2), start + 2) if close >= 0 else None
+        if char == '[' and options.remove_links:
+            # [文字](地址)：文字和地址都不能为空，去掉 [ 与 ](地址)
+            close = self._find(']', start + 1)
+            if close > start + 1 and text.startswith('(', close + 1):
+                paren = self._find(')', close + 2)
+                if paren > close + 2:
+                    return None, (close, paren + 1), start + 1
+        return None
+
+    def _find(self, marker, start, single=False):
+        """marker 在 start 及之后第一次出现的位置，找不到返回 -1；
+        single 时跳过后面紧跟着同一字符的位置（斜体的结束标记）"""
+        key = (marker, single)
+        found = self._found.get(key)
+        if found is not None and (found < 0 or found >= start):
+            return found
+        text = self.text
+        found = text.find(marker, start)
+        if single:
+            while found >= 0 and text.startswith(marker, found + 1):
+                found = text.find(marker, found + 1)
+        self._found[key] = found
+        return found
+
+
+def merge_runs(runs):
+    """把导出格式相同的相邻片段合并为一个，减少文档中的 <w:r> 数量"""
+    merged = []
+    for kind, group in groupby(runs, key=lambda run: RUN_FORMATS.get(run.kind, run.kind)):
+        group = tuple(group)
+        merged.append(group[0] if len(group) == 1 else Run(kind, ''.join(run.text for run in group)))
+    return tuple(merged)
+
+
+def _strip_pairs(text, opener, closer):
+    """去掉 text 中成对的 opener…closer 标记（惰性匹配），保留内容"""
+    start = text.find(opener)
+    if start < 0:
+        return text
+    pieces = []
+    pos = 0
+    while start >= 0:
+        close = text.find(closer, start + len(opener))
+        if close < 0:
+            break
+        pieces += (text[pos:start], text[start + len(opener):close])
+        pos = close + len(closer)
+        start = text.find(opener, pos)
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def _inline_key(options):
+    """影响行内格式结果的选项"""
+    return (bool(options.remove_italic), bool(options.remove_strikethrough),
+            bool(options.remove_highlight), bool(options.remove_links))
+
+
+class ParseCancelled(Exception):
+    """后台预先解析被放弃（已有更新的文本）"""
+
+
+class DocumentParser:
+    """带缓存的解析器
+
+    文本和选项都与上一次相同时直接返回上一次的文档树；行内格式结果按行缓存，
+    编辑后重新解析时只有变化的行需要重新处理。缓存只保留最近一次解析用到的行。
+    """
+
+    def __init__(self):
+        self._last = None   # (文本, 选项, 文档树)
+        self._runs_key = None
+        self._runs = {}     # 行 -> 行内格式片段
+        self._lock = threading.Lock()
+
+    def parse(self, text, options=Options(), cancelled=None):
+        """解析 text；cancelled() 返回 True 时放弃解析并抛出 ParseCancelled，
+        已处理的行仍留在缓存中，下次解析不必重算"""
+        with self._lock:
+            last = self._last
+            if last is not None and last[1] == options and last[0] == text:
+                return last[2]
+
+            key = _inline_key(options)
+            previous = self._runs if key == self._runs_key else {}
+            cache = {}
+
+            def runs(line):
+                if cancelled is not None and cancelled():
+                    raise ParseCancelled()
+                result = cache.get(line)
+                if result is None:
+                    result = previous.get(line) or inline_runs(line, options)
+                    cache[line] = result
+                return result
+
+            try:
+                tree = parse(text, options, runs)
+            except ParseCancelled:
+                previous.update(cache)
+                self._runs_key = key
+                self._runs = previous
+                raise
+            self._last = (text, options, tree)
+            self._runs_key = key
+            self._runs = cache
+        return tree
+
+    def clear(self):
+        with self._lock:
+            self._last = None
+            self._runs_key = None
+            self._runs = {}
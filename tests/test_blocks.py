@@ -0,0 +1,36 @@
+from mdword import clean
+from mdword.blocks import IncrementalCleaner, split_blocks
+from mdword.options import Options
+
+
+def headings_and_tables(sections=200):
+    """只有标题和管道表格的文档：没有以字母开头、其后为空白行的行"""
+    parts = []
+    for i in range(sections):
+        parts.append(f"# 标题 {i}\n## **小节** {i}\n| a | b |\n|---|---|\n| [{i}](x) | `{i}` |\n")
+    return '\n'.join(parts)
+
+
+def test_heading_and_table_documents_split_into_blocks():
+    text = headings_and_tables()
+    for options in (Options(), Options(remove_links=True)):
+        blocks = split_blocks(text, options)
+        assert len(blocks) > 1
+        assert '\n'.join(blocks) == text
+
+
+def test_table_lines_are_not_cut_points_when_tables_are_processed():
+    text = '\n\n'.join('| a | b |' for _ in range(1000))
+    assert len(split_blocks(text, Options())) > 1
+    assert len(split_blocks(text, Options(table_clean=True))) == 1
+    assert len(split_blocks(text, Options(table_conversion=","))) == 1
+
+
+def test_incremental_edits_match_clean():
+    text = headings_and_tables()
+    cleaner = IncrementalCleaner()
+    for options in (Options(), Options(remove_links=True), Options(table_clean=True)):
+        edited = text
+        for pos in (len(text) // 3, len(text) // 2, len(text) - 5):
+            edited = edited[:pos] + '#' + edited[pos:]
+            assert cleaner.clean(edited, options) == clean(edited, options)
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from mdword.options import Options
+from mdword.scheduler import ProcessingScheduler
+from mdword.tree import DocumentParser, ParseCancelled
+
+DELAY = 0.05
+
+# 准备工作本身要做的时间；下一次结果的等待时间必须远小于它
+PREPARE_SECONDS = 2.0
+
+
+def busy_prepare(done):
+    def prepare(text, options, cancelled=lambda: False):
+        end = time.monotonic() + PREPARE_SECONDS
+        while time.monotonic() < end:
+            if cancelled():
+                return
+        done.set()
+    return prepare
+
+
+def test_prepare_does_not_delay_the_next_result():
+    results = []
+    delivered = threading.Event()
+
+    def on_result(value):
+        results.append(value)
+        delivered.set()
+
+    scheduler = ProcessingScheduler(lambda text, options: text, on_result, delay=DELAY,
+                                    prepare=busy_prepare(threading.Event()))
+    try:
+        scheduler.submit('a', Options())
+        assert delivered.wait(5)
+        delivered.clear()
+        time.sleep(0.1)  # 准备工作已经开始
+        start = time.perf_counter()
+        scheduler.submit('b', Options())
+        assert delivered.wait(5)
+        assert time.perf_counter() - start < DELAY + 0.5
+        assert results == ['a', 'b']
+    finally:
+        scheduler.stop()
+
+
+def test_prepare_runs_to_completion_when_idle():
+    done = threading.Event()
+    scheduler = ProcessingScheduler(lambda text, options: text, lambda value: None, delay=DELAY,
+                                    prepare=busy_prepare(done))
+    try:
+        scheduler.submit('a', Options())
+        assert done.wait(PREPARE_SECONDS + 5)
+    finally:
+        scheduler.stop()
+
+
+def test_cancelled_parse_keeps_finished_lines():
+    text = '\n'.join(f'**line** {i}' for i in range(100))
+    parser = DocumentParser()
+    calls = []
+
+    def cancelled():
+        calls.append(None)
+        return len(calls) > 50
+
+    with pytest.raises(ParseCancelled):
+        parser.parse(text, Options(), cancelled)
+    assert len(parser._runs) == 50
+    assert parser.parse(text, Options()) == DocumentParser().parse(text, Options())
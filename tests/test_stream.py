@@ -0,0 +1,59 @@
+import io
+import tracemalloc
+
+import pytest
+
+from mdword import clean, iter_clean
+from mdword.options import Options
+
+CHUNK_SIZE = 4096
+
+UNIT = 'word text here\n\n'
+
+
+class GeneratedText:
+    """按需生成的文本流：head 之后是重复的段落，整篇文本不在内存中"""
+
+    def __init__(self, head, size):
+        self.head = head
+        self.left = size
+
+    def read(self, size):
+        if self.head:
+            head, self.head = self.head, ''
+            return head
+        size = min(size, self.left)
+        self.left -= size
+        return (UNIT * (size // len(UNIT) + 1))[:size]
+
+
+def peak_memory(head, size, options):
+    tracemalloc.start()
+    try:
+        for _ in iter_clean(GeneratedText(head, size), options, CHUNK_SIZE):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('head', ['md`` open\n\n', '[open\n\n', 'see [a](open\n\n'])
+def test_unclosed_span_memory_does_not_grow_with_input(head):
+    options = Options(remove_links=True)
+    small = peak_memory(head, 100 * CHUNK_SIZE, options)
+    large = peak_memory(head, 400 * CHUNK_SIZE, options)
+    # 不限制暂存时 large 约为 small 的四倍
+    assert large < 1.5 * small
+
+
+@pytest.mark.parametrize('head', ['md`` open\n\n', '[open\n\n', 'see [a](open\n\n'])
+def test_unclosed_span_output_matches_clean(head):
+    options = Options(remove_links=True)
+    text = head + UNIT * 5000
+    assert ''.join(iter_clean(io.StringIO(text), options, 1024)) == clean(text, options)
+
+
+def test_span_closing_within_limit_matches_clean():
+    options = Options(remove_links=True)
+    text = 'md`` open\n\n' + UNIT * 100 + 'closed``\n\n[a\n\nb](c)\n\n' + UNIT * 100
+    assert ''.join(iter_clean(io.StringIO(text), options, 1024)) == clean(text, options)
@@ -10,25 +10,14 @@ from kivy.uix.scrollview import ScrollView
 from kivy.lang import Builder
 from kivy.properties import BooleanProperty, OptionProperty
 from kivy.clock import Clock
-import re
 import os
 import sys
-import time
+from importlib.util import find_spec
 from kivy.utils import platform
+from mdword import options_from, describe_options, clean, to_docx  # 清洗/导出核心
 
-# 修改Word处理库导入方式，在所有平台上尝试导入
-try:
-    from docx import Document
-    from docx.shared import Pt, Inches, RGBColor
-    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-    from docx.oxml.ns import qn
-    
-    # 定义常用颜色
-    BLACK_COLOR = RGBColor(0, 0, 0)
-    BLUE_COLOR = RGBColor(0, 0, 255)
-    WORD_AVAILABLE = True
-except ImportError:
-    WORD_AVAILABLE = False
+# Word处理库在导出时才导入，这里只检查是否已安装
+WORD_AVAILABLE = find_spec('docx') is not None and find_spec('lxml') is not None
 
 # Android剪贴板处理
 if platform == 'android':
@@ -300,50 +289,8 @@ class MarkdownTool(BoxLayout):
 
     def process_markdown(self):
         try:
-            text = self.ids.input_area.text
-            text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-            text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-            text = re.sub(r"''(.*?)''", r'\1', text)
-
-            if self.remove_italic:
-                text = re.sub(r'(?<!\*)\*(?!\*)(.*?)\*(?!\*)', r'\1', text)
-                text = re.sub(r'(?<!_)_(?!_)(.*?)_(?!_)', r'\1', text)
-            if self.remove_strikethrough:
-                text = re.sub(r'~~(.*?)~~', r'\1', text)
-            if self.remove_highlight:
-                text = re.sub(r'==(.+?)==', r'\1', text)
-            if self.remove_links:
-                text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-            if self.remove_unordered_list:
-                text = re.sub(r'(?m)^\s*[-*+]\s+', '', text)
-            if self.remove_ordered_list:
-                text = re.sub(r'(?m)^\s*\d+\.\s+', '', text)
-
-            if self.table_clean:
-                text = re.sub(r'(?m)^\s*\|?[\s\-|]+\|?\s*$', '', text)
-                text = text.replace("|", "")
-            elif self.table_conversion != "无":
-                lines = text.splitlines()
-                processed_lines = []
-                for line in lines:
-                    if re.match(r'^\s*\|?[\s\-|]+\|?\s*$', line):
-                        continue
-                    line = line.strip()
-                    if line.startswith("|"):
-                        line = line[1:]
-                    if line.endswith("|"):
-                        line = line[:-1]
-                    if self.table_conversion == "空格":
-                        line = line.replace("|", "    ")
-                    elif self.table_conversion == "/t":
-                        line = line.replace("|", "\t")
-                    elif self.table_conversion == ",":
-                        line = line.replace("|", ",")
-                    processed_lines.append(line)
-                text = "\n".join(processed_lines)
-
-            text = re.sub(r'(?m)^(?:\s*[-*_]{3,}\s*)$', '', text)
-            self.ids.output_area.text = text.strip()
+            # 清洗规则与桌面版相同，见 mdword.cleaner
+            self.ids.output_area.text = clean(self.ids.input_area.text, options_from(self))
         except Exception as e:
             self.ids.output_area.text = f"处理错误: {str(e)}"
 
@@ -356,136 +303,6 @@ class MarkdownTool(BoxLayout):
     def process_reset(self, target):
         getattr(self.ids, f"{target}_area").text = ''
 
-    def _extract_table(self, lines, start_index):
-        """从Markdown文本中提取完整的表格并返回表格数据和新的索引"""
-        table_data = []
-        i = start_index
-        has_header_separator = False
-        
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            # 如果行为空或不包含|，则表格结束
-            if not line or '|' not in line:
-                break
-                
-            # 检查是否为分隔行（包含 ----|----）
-            if re.match(r'^\s*\|?[\s\-:|]+\|?\s*$', line):
-                has_header_separator = True
-                i += 1
-                continue
-                
-            # 提取单元格数据
-            cells = [cell.strip() for cell in line.strip('|').split('|')]
-            table_data.append(cells)
-            
-            i += 1
-        
-        return table_data, has_header_separator, i
-        
-    def _process_table(self, doc, table_data, has_header):
-        """将提取的表格数据转换为Word表格"""
-        if not table_data or not table_data[0]:
-            return
-            
-        # 创建表格
-        rows_count = len(table_data)
-        cols_count = max(len(row) for row in table_data)
-        
-        table = doc.add_table(rows=rows_count, cols=cols_count)
-        table.style = 'Table Grid'  # 应用表格网格样式
-        
-        # 填充表格内容
-        for i, row_data in enumerate(table_data):
-            for j, cell_content in enumerate(row_data):
-                if j < cols_count:  # 确保不超出列数
-                    cell = table.cell(i, j)
-                    # 处理单元格中的Markdown格式
-                    para = cell.paragraphs[0]
-                    self._add_text_with_bold(para, cell_content)
-                    
-                    # 如果有表头且这是第一行，设置加粗和居中
-                    if has_header and i == 0:
-                        for run in para.runs:
-                            run.bold = True
-                            run.font.name = '黑体'
-                            run._element.rPr.rFonts.set(qn('w:eastAsia'), '黑体')
-                        para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                        
-        # 添加表格后的空行
-        doc.add_paragraph()
-    
-    def _add_text_with_bold(self, paragraph, text):
-        """处理文本，保留加粗格式"""
-        # 查找所有加粗部分
-        bold_parts = re.finditer(r'\*\*(.*?)\*\*', text)
-        
-        last_end = 0
-        has_bold = False
-        
-        for match in bold_parts:
-            has_bold = True
-            start, end = match.span()
-            # 添加加粗前的普通文本
-            if start > last_end:
-                normal_run = paragraph.add_run(text[last_end:start])
-                normal_run.font.name = '宋体'
-                # 添加东亚字体设置
-                normal_run._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
-                
-            # 添加加粗文本 - 明确设置为加粗且使用黑体
-            bold_run = paragraph.add_run(match.group(1))
-            bold_run.bold = True  # 确保加粗
-            bold_run.font.name = '黑体'  # 加粗文本使用黑体
-            # 添加东亚字体设置
-            bold_run._element.rPr.rFonts.set(qn('w:eastAsia'), '黑体')
-            
-            last_end = end
-            
-        # 如果没有加粗部分，直接添加整个文本
-        if not has_bold and last_end == 0:
-            # 处理其他可能的Markdown标记
-            processed_text = self._process_markdown_inline(text)
-            normal_run = paragraph.add_run(processed_text)
-            normal_run.font.name = '宋体'
-            # 添加东亚字体设置
-            normal_run._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
-            return
-            
-        # 添加最后剩余的普通文本
-        if last_end < len(text):
-            # 移除可能存在的其他Markdown标记
-            remaining_text = text[last_end:]
-            processed_text = self._process_markdown_inline(remaining_text)
-            
-            normal_run = paragraph.add_run(processed_text)
-            normal_run.font.name = '宋体'
-            # 添加东亚字体设置
-            normal_run._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
-            
-    def _process_markdown_inline(self, text):
-        """处理内联Markdown标记"""
-        processed_text = text
-        
-        # 移除斜体（如果启用了该选项）
-        if self.remove_italic:
-            processed_text = re.sub(r'(?<!\*)\*(?!\*)(.*?)\*(?!\*)', r'\1', processed_text)
-            processed_text = re.sub(r'(?<!_)_(?!_)(.*?)_(?!_)', r'\1', processed_text)
-            
-        # 移除删除线（如果启用了该选项）
-        if self.remove_strikethrough:
-            processed_text = re.sub(r'~~(.*?)~~', r'\1', processed_text)
-            
-        # 移除高亮（如果启用了该选项）
-        if self.remove_highlight:
-            processed_text = re.sub(r'==(.+?)==', r'\1', processed_text)
-            
-        # 移除链接（如果启用了该选项）
-        if self.remove_links:
-            processed_text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', processed_text)
-            
-        return processed_text
-        
     def export_to_word(self):
         """导出为Word文档功能"""
         if not WORD_AVAILABLE:
@@ -555,21 +372,14 @@ class MarkdownTool(BoxLayout):
             Intent = autoclass('android.content.Intent')
             Environment = autoclass('android.os.Environment')
             Uri = autoclass('android.net.Uri')
-            FileOutputStream = autoclass('java.io.FileOutputStream')
-            ParcelFileDescriptor = autoclass('android.os.ParcelFileDescriptor')
             ContentResolver = autoclass('android.content.ContentResolver')
             
             # 定义文件类型和用于Word文档的MIME类型
             DOC_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             
-            # 创建一个临时文件来保存Word文档
-            temp_dir = os.path.join(PythonActivity.mActivity.getCacheDir().getAbsolutePath(), "temp")
-            if not os.path.exists(temp_dir):
-                os.makedirs(temp_dir)
-            temp_file = os.path.join(temp_dir, "temp_document.docx")
-            
-            # 首先保存到临时文件
-            self.save_word_document(temp_file)
+            # 导出开始时的内容快照，选择保存位置期间继续编辑不影响本次导出
+            text = self.ids.input_area.text
+            options = options_from(self)
             
             # 定义结果处理的回调
             result_handler = []
@@ -625,39 +435,14 @@ class MarkdownTool(BoxLayout):
                             descriptor = content_resolver.openFileDescriptor(uri, "w")
                             if descriptor:
                                 file_descriptor = descriptor.detachFd()
-                                output_stream = ParcelFileDescriptor.AutoCloseOutputStream(
-                                    ParcelFileDescriptor.adoptFd(file_descriptor))
-                                
-                                # 读取临时文件并写入到新创建的文件
-                                with open(temp_file, 'rb') as f:
-                                    data = f.read()
-                                    output_stream.write(data)
-                                    output_stream.flush()
-                                    output_stream.close()
+
+                                # 直接导出到新创建文件的描述符，不经过临时文件（转换逻辑见 mdword.export）
+                                with os.fdopen(file_descriptor, 'wb') as f:
+                                    to_docx(text, options, f)
                                 
                                 # 显示成功消息
                                 def show_success():
-                                    options_summary = []
-                                    if self.remove_italic:
-                                        options_summary.append("去除斜体")
-                                    if self.remove_strikethrough:
-                                        options_summary.append("去除删除线")
-                                    if self.remove_highlight:
-                                        options_summary.append("去除高亮")
-                                    if self.remove_links:
-                                        options_summary.append("去除链接")
-                                    if self.remove_unordered_list:
-                                        options_summary.append("清洗无序列表")
-                                    if self.remove_ordered_list:
-                                        options_summary.append("清洗有序列表")
-                                    if self.table_clean:
-                                        options_summary.append("表格清洁")
-                                    elif self.table_conversion != "无":
-                                        options_summary.append(f"表格转换: {self.table_conversion}")
-                                    if self.table_to_word and not self.table_clean and self.table_conversion == "无":
-                                        options_summary.append("表格转为Word表格")
-                                        
-                                    options_text = "，".join(options_summary) if options_summary else "保留所有格式"
+                                    options_text = describe_options(options)
                                     success_message = f"文档已成功导出\n\n应用的处理选项: {options_text}"
                                     
                                     self.show_message_popup(success_message)
@@ -797,173 +582,11 @@ class MarkdownTool(BoxLayout):
     def save_word_document(self, filepath):
         """将Markdown内容保存为Word文档"""
         try:
-            # 创建Word文档
-            doc = Document()
-            
-            # 设置基本样式
-            doc.styles['Normal'].font.name = '宋体'
-            doc.styles['Normal'].font.size = Pt(12)
-            # 确保中文字体名称可以识别
-            doc.styles['Normal']._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
-            
-            # 设置标题样式：黑体、黑色、加粗
-            for i in range(1, 10):  # Word支持9级标题
-                heading_name = f'Heading {i}'
-                if heading_name in doc.styles:
-                    heading_style = doc.styles[heading_name]
-                    # 明确设置黑体字
-                    heading_style.font.name = '黑体' 
-                    # 确保中文字体名称可以识别，有些环境可能需要英文字体名
-                    heading_style._element.rPr.rFonts.set(qn('w:eastAsia'), '黑体')
-                    heading_style.font.bold = True  # 加粗
-                    heading_style.font.italic = False  # 不斜体
-                    # 确保标题字体颜色为黑色
-                    heading_style.font.color.rgb = BLACK_COLOR  # 使用常量
-            
-            # 获取原始Markdown文本
-            md_text = self.ids.input_area.text
-            
-            # 处理Markdown文本，保留基本结构
-            lines = md_text.splitlines()
-            
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # 跳过空行
-                if not line:
-                    doc.add_paragraph()
-                    i += 1
-                    continue
-                
-                # 处理标题 - 正确对应Markdown标题级别和Word标题级别
-                heading_match = re.match(r'^(#+)\s+(.*)', line)
-                if heading_match:
-                    # 获取#的数量作为标题级别
-                    hash_count = len(heading_match.group(1))
-                    # Markdown中#对应一级标题，##对应二级标题，以此类推
-                    level = hash_count
-                    text = heading_match.group(2)
-                    
-                    # 添加对应级别的标题
-                    heading = doc.add_heading(text, level=level)
-                    
-                    # 确保标题使用黑体，加粗，不斜体，颜色为黑色
-                    for run in heading.runs:
-                        run.font.name = '黑体'
-                        # 确保中文字体名称可以识别
-                        run._element.rPr.rFonts.set(qn('w:eastAsia'), '黑体')
-                        run.bold = True  # 确保加粗
-                        run.italic = False
-                        run.font.color.rgb = BLACK_COLOR  # 使用常量设置为黑色
-                    
-                    i += 1
-                    continue
-                
-                # 处理无序列表
-                list_match = re.match(r'^\s*([-*+])\s+(.*)', line)
-                if list_match and not self.remove_unordered_list:
-                    list_item = doc.add_paragraph(style='List Bullet')
-                    
-                    # 提取列表项文本并处理其中的加粗
-                    text = list_match.group(2)
-                    self._add_text_with_bold(list_item, text)
-                    
-                    i += 1
-                    continue
-                elif list_match and self.remove_unordered_list:
-                    # 如果设置了移除无序列表，则作为普通段落处理
-                    para = doc.add_paragraph()
-                    self._add_text_with_bold(para, list_match.group(2))
-                    i += 1
-                    continue
-                
-                # 处理有序列表
-                ordered_list_match = re.match(r'^\s*(\d+\.)\s+(.*)', line)
-                if ordered_list_match and not self.remove_ordered_list:
-                    list_item = doc.add_paragraph(style='List Number')
-                    self._add_text_with_bold(list_item, ordered_list_match.group(2))
-                    i += 1
-                    continue
-                elif ordered_list_match and self.remove_ordered_list:
-                    # 如果设置了移除有序列表，则作为普通段落处理
-                    para = doc.add_paragraph()
-                    self._add_text_with_bold(para, ordered_list_match.group(2))
-                    i += 1
-                    continue
-                
-                # 处理表格（简化处理，表格转换为制表符）
-                if '|' in line and not line.startswith('>'):
-                    # 如果启用了表格转Word表格选项并且不是清洁模式
-                    if self.table_to_word and not self.table_clean and self.table_conversion == "无":
-                        # 提取完整表格
-                        table_data, has_header, i = self._extract_table(lines, i)
-                        # 处理表格为Word表格
-                        self._process_table(doc, table_data, has_header)
-                        continue
-                    
-                    # 检查是否是表格分隔行
-                    if re.match(r'^\s*\|?[\s\-:|]+\|?\s*$', line):
-                        i += 1
-                        continue
-                    
-                    # 按照表格转换设置处理
-                    cells = [cell.strip() for cell in line.strip('|').split('|')]
-                    
-                    # 根据表格转换选项处理
-                    if self.table_clean:
-                        # 如果启用了table_clean，直接处理为简单文本，使用空格分隔
-                        text = " ".join(cells)
-                    elif self.table_conversion == "无":
-                        # 默认使用空格
-                        text = " ".join(cells)
-                    elif self.table_conversion == "空格":
-                        text = "    ".join(cells)
-                    elif self.table_conversion == "/t":
-                        text = "\t".join(cells)
-                    elif self.table_conversion == ",":
-                        text = ",".join(cells)
-                    else:
-                        # 默认使用空格
-                        text = " ".join(cells)
-                    
-                    para = doc.add_paragraph()
-                    self._add_text_with_bold(para, text)
-                    i += 1
-                    continue
-                
-                # 处理普通段落和其他格式
-                para = doc.add_paragraph()
-                
-                # 处理文本，保留加粗格式
-                self._add_text_with_bold(para, line)
-                i += 1
-            
-            # 保存Word文档
-            doc.save(filepath)
-            
-            # 生成处理选项的摘要
-            options_summary = []
-            if self.remove_italic:
-                options_summary.append("去除斜体")
-            if self.remove_strikethrough:
-                options_summary.append("去除删除线")
-            if self.remove_highlight:
-                options_summary.append("去除高亮")
-            if self.remove_links:
-                options_summary.append("去除链接")
-            if self.remove_unordered_list:
-                options_summary.append("清洗无序列表")
-            if self.remove_ordered_list:
-                options_summary.append("清洗有序列表")
-            if self.table_clean:
-                options_summary.append("表格清洁")
-            elif self.table_conversion != "无":
-                options_summary.append(f"表格转换: {self.table_conversion}")
-            if self.table_to_word and not self.table_clean and self.table_conversion == "无":
-                options_summary.append("表格转为Word表格")
-                
-            options_text = "，".join(options_summary) if options_summary else "保留所有格式"
+            # 转换逻辑见 mdword.export
+            options = options_from(self)
+            to_docx(self.ids.input_area.text, options, filepath)
+
+            options_text = describe_options(options)
             success_message = f"文档已成功保存至:\n{filepath}\n\n应用的处理选项: {options_text}"
             
             self.show_message_popup(success_message)